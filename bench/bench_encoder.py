@@ -0,0 +1,58 @@
+# Benchmark: instructions per second of the bit string encoding against the integer encoder
+# Usage: python3 bench/bench_encoder.py [instruction count]
+import sys
+import time
+
+import synthetic
+from utils import INSTRUCTIONS, Byte
+from asm_scanner import Scanner
+from asm_table_parser import TableParser
+from asm_encoder import emitInst
+from asm_visitor import INST_NODE_TYPES
+
+
+# Operand widths per type, with the zero padding the bit string encoding appended after the operands
+STRING_LAYOUTS = {
+    'n': ((), '0000000000'), 'r': ((2, 4, 4), ''), 'i': ((2, 8), ''), 's': ((2, 4, 4), ''), 'j': ((10,), ''),
+    'e1': ((2, 4), '0000'), 'e2': ((4,), ''), 'e3': ((2,), '00000000'), 'e4': ((4,), '0000')
+}
+
+
+def stringEncode(node) -> list: # Reference: the bit string concatenation the Visitor used before the integer encoder
+    instType, opcode = INSTRUCTIONS[node.lexeme]
+    widths, padding = STRING_LAYOUTS[instType]
+    inst = opcode + ('000000' if instType == 'e2' else '') + ('00' if instType == 'e4' else '')
+
+    for width, child in zip(widths, node.children):
+        lexeme = child.lexeme if child.type == 'Number' else child.lexeme[1:]
+        inst += bin(int(lexeme))[2:].zfill(width)
+
+    inst += padding
+
+    return [Byte(inst[:8]), Byte(inst[8:])]
+
+def main() -> None:
+    instCount = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    ast = TableParser(Scanner(synthetic.generate(instCount)).getTokenStream()).getAst()
+    nodes = [node for field in ast.children for node in field.children if node.type in INST_NODE_TYPES]
+
+    start = time.perf_counter()
+    code = []
+    for node in nodes:
+        code += stringEncode(node)
+    stringTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buffer = bytearray()
+    for node in nodes:
+        emitInst(buffer, node)
+    intTime = time.perf_counter() - start
+
+    assert bytes(int(byte.byte, 2) for byte in code) == bytes(buffer)
+
+    print(f'{len(nodes)} instructions')
+    print(f'bit strings: {len(nodes) / stringTime:,.0f} insts/s')
+    print(f'    integer: {len(nodes) / intTime:,.0f} insts/s')
+
+
+if __name__ == '__main__': main()
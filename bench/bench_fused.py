@@ -0,0 +1,35 @@
+# Benchmark: compile through the single pass assembler against the Scanner -> TableParser -> Visitor pipeline.
+# Checks both give the same bytes on a generated corpus first
+# Usage: python3 bench/bench_fused.py [instructions]
+import sys
+import time
+
+import synthetic
+from asm_fused import assembleFused
+from compiler import compile
+
+
+def checkCorpus(count: int = 200) -> None:
+    for seed in range(count):
+        source = synthetic.generate(500, 50, seed, labelRate=0.2, commentRate=0.3, fieldSize=seed % 20)
+
+        assert assembleFused(source) is not None, f'single pass assembler gave up on seed {seed}'
+        assert compile(source, fused=True).code == compile(source).code, f'different output for seed {seed}'
+
+    print(f'{count} generated programs: identical output')
+
+def main() -> None:
+    instCount = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    source = synthetic.generate(instCount, instCount // 10, fieldSize=1000)
+
+    checkCorpus()
+
+    for name, fused in (('pipeline', False), ('single pass', True)):
+        start = time.perf_counter()
+        code = compile(source, fused=fused)
+        elapsed = time.perf_counter() - start
+
+        print(f'{name:>11}: {elapsed:.2f} s ({len(source) / elapsed / 1_000_000:.2f} MB/s, {len(code)} bytes)')
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,50 @@
+# Benchmark: import time of the assembler, and the time to parse the instruction tables
+# Usage: python3 bench/bench_import.py
+import os
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+import utils
+
+
+def getImportTimes(statement: str) -> dict[str, int]: # Cumulative import time in microseconds per module
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement], cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, module = line.split('|')
+
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+
+    return times
+
+def timeCall(function, repeat: int = 200) -> float: # Microseconds per call
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        function()
+
+    return (time.perf_counter() - start) / repeat * 1_000_000
+
+def loadCsv() -> None:
+    utils.getInsts()
+    utils.getPseudoInsts()
+
+def main() -> None:
+    getImportTimes('import main') # Warm up the bytecode cache
+
+    times = getImportTimes('import main')
+    print(f'import main: {times["main"]} us (utils {times["utils"]} us, compiler {times["compiler"]} us)')
+
+    print(f'CSV parse: {timeCall(loadCsv):.0f} us')
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,86 @@
+# Benchmark: throughput and peak RSS of scanning and of streaming a binary image, with the source read into a str
+# against memory-mapped and scanned as bytes. Each run is a fresh process, so its peak RSS is its own
+# Usage: python3 bench/bench_mmap.py [megabytes of source]
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic
+from asm_scanner import Scanner
+from compiler import mapSource, CodeStream
+from loader import writeBinaryStream
+
+
+MODES = ('scan', 'stream')
+INPUTS = ('read', 'mmap')
+
+
+def work(mode: str, source, outputPath: str) -> None:
+    if mode == 'scan':
+        for _ in Scanner(source, lazy=True).iterTokens():
+            pass
+    else:
+        writeBinaryStream(CodeStream(source), outputPath)
+
+def run(mode: str, input: str, sourcePath: str, outputPath: str) -> None: # In the child process: time one run
+    start = time.perf_counter()
+
+    if input == 'mmap':
+        with mapSource(sourcePath) as source:
+            work(mode, source, outputPath)
+    else:
+        with open(sourcePath, 'r') as f:
+            work(mode, f.read(), outputPath)
+
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'maxRss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}))
+
+def measure(mode: str, input: str, sourcePath: str, outputPath: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', mode, input, sourcePath, outputPath],
+        check=True, capture_output=True, text=True
+    ).stdout
+
+    return json.loads(output)
+
+def main() -> None:
+    if sys.argv[1:2] == ['--child']:
+        run(*sys.argv[2:6])
+        return
+
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    with tempfile.TemporaryDirectory() as directory:
+        sourcePath = os.path.join(directory, 'big.s')
+
+        with open(sourcePath, 'w') as f: # Chunks of a fixed program until the size is reached
+            chunk = synthetic.generate(20_000, 2_000, labelRate=0, fieldSize=1000)
+
+            for _ in range(max(1, megabytes * 1_000_000 // len(chunk))):
+                f.write(chunk)
+
+        size = os.path.getsize(sourcePath)
+        print(f'{size / 1_000_000:.1f} MB of source')
+
+        for mode in MODES:
+            images = [] # Output of each input path, the same image in every one
+
+            for input in INPUTS:
+                outputPath = os.path.join(directory, f'{mode}-{input}.bin')
+                result = measure(mode, input, sourcePath, outputPath)
+                print(f'{mode:>6} {input:>4}: {size / 1_000_000 / result["seconds"]:6.1f} MB/s, '
+                      f'peak RSS {result["maxRss"] / 1_000_000:7.1f} MB')
+
+                if mode == 'stream':
+                    with open(outputPath, 'rb') as f:
+                        images.append(f.read())
+
+            if images:
+                assert images.count(images[0]) == len(images)
+
+
+if __name__ == '__main__': main()
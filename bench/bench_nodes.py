@@ -0,0 +1,48 @@
+# Benchmark: AST nodes per second built by the TableParser and walked by the Visitor, and memory per node, for the
+# Node tree and the flat array layout
+# Usage: python3 bench/bench_nodes.py [instructions]
+import sys
+import time
+import tracemalloc
+
+import synthetic
+from asm_scanner import Scanner
+from asm_table_parser import TableParser
+from asm_visitor import Visitor
+from compiler import countNodes
+
+
+def measure(tokens: list, flat: bool) -> tuple[int, float, float, float]: # Nodes, parse and visit seconds, bytes
+    start = time.perf_counter()
+    ast = TableParser(tokens, flat).getAst()
+    parseTime = time.perf_counter() - start
+
+    nodeCount = countNodes(ast)
+
+    start = time.perf_counter()
+    Visitor(ast)
+    visitTime = time.perf_counter() - start
+
+    del ast
+    tracemalloc.start()
+    ast = TableParser(tokens, flat).getAst()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return nodeCount, parseTime, visitTime, size
+
+def main() -> None:
+    instCount = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    source = synthetic.generate(instCount, instCount // 10, fieldSize=1000)
+    tokens = Scanner(source).getTokenStream()
+
+    for name, flat in (('Node tree', False), ('flat arrays', True)):
+        nodeCount, parseTime, visitTime, size = measure(tokens, flat)
+
+        print(f'{name}: {nodeCount} nodes')
+        print(f'   parse: {nodeCount / parseTime:,.0f} nodes/s')
+        print(f'   visit: {nodeCount / visitTime:,.0f} nodes/s')
+        print(f'  memory: {size / nodeCount:.1f} bytes/node')
+
+
+if __name__ == '__main__': main()
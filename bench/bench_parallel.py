@@ -0,0 +1,56 @@
+# Benchmark: wall time of the process pool build driver for 1 to 8 jobs against the serial batch build
+# Usage: python3 bench/bench_parallel.py [file count] [instructions per file]
+import os
+import sys
+import tempfile
+import time
+
+import synthetic
+from build import BuildDriver
+from main import assembleFiles
+
+
+def makeSources(directory: str, fileCount: int, instCount: int) -> list[str]: # Files sharing two include libraries
+    os.makedirs(os.path.join(directory, 'lib'))
+
+    for index in range(2):
+        with open(os.path.join(directory, 'lib', f'lib{index}.s'), 'w') as f:
+            f.write(synthetic.generate(instCount, seed=1000 + index, labelRate=0))
+
+    fileNames = []
+
+    for index in range(fileCount):
+        fileName = os.path.join(directory, f'unit{index}.s')
+
+        with open(fileName, 'w') as f:
+            f.write(f'.include "lib/lib{index % 2}.s"\n' + synthetic.generate(instCount, instCount // 10, index))
+
+        fileNames.append(fileName)
+
+    return fileNames
+
+def main() -> None:
+    fileCount = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    instCount = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    with tempfile.TemporaryDirectory() as directory:
+        fileNames = makeSources(directory, fileCount, instCount)
+
+        start = time.perf_counter()
+        serial = assembleFiles(fileNames, None)
+        serialTime = time.perf_counter() - start
+
+        print(f'{fileCount} files, {os.cpu_count()} CPUs')
+        print(f'  serial: {serialTime:.2f} s')
+
+        for jobs in (1, 2, 4, 8):
+            start = time.perf_counter()
+            results = BuildDriver(fileNames, jobs).build()
+            elapsed = time.perf_counter() - start
+
+            assert all(results[fileName].code == serial[fileName].code for fileName in serial)
+
+            print(f'{jobs:>2} jobs: {elapsed:.2f} s (speedup {serialTime / elapsed:.2f}x)')
+
+
+if __name__ == '__main__': main()
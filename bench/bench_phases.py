@@ -0,0 +1,127 @@
+# Benchmark: time of the Scanner, TableParser and Visitor phases and of compiler.compile on a synthetic program.
+# Results are written as JSON. With --baseline, exits with status 1 when a phase is slower than the baseline by more
+# than the threshold. Baselines are only comparable on the same machine and Python version
+# Usage: python3 bench/bench_phases.py [--insts N] [--data N] [--includes N] [--types r,i,...] [--field-size N]
+#                                      [--jump-rate F] [--repeat N] [-o results.json] [--baseline baseline.json] [--threshold 0.2]
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import synthetic
+from asm_scanner import Scanner
+from asm_table_parser import TableParser
+from asm_visitor import Visitor
+from compiler import compile, IncludeCache
+from utils import INSTRUCTIONS
+
+
+def timePhases(fileName: str) -> dict[str, float]: # Seconds of each phase, for one run
+    times = {}
+
+    with open(fileName, 'r') as f:
+        source = f.read()
+
+    gc.collect()
+    gc.disable() # As timeit does, collections triggered by earlier phases would be charged to later ones
+
+    start = time.perf_counter()
+    tokens = Scanner(source).getTokenStream()
+    times['scanner'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ast = TableParser(tokens).getAst()
+    times['parser'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Visitor(ast, True, fileName, IncludeCache()) # Includes are assembled here, as in compile
+    times['visitor'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compile(source, True, fileName)
+    times['compile'] = time.perf_counter() - start
+
+    gc.enable()
+
+    return times
+
+def getTypes(argument: str) -> list[str]: # Instruction types from a comma separated list, as in data/insts.csv
+    types = sorted(set(argument.split(',')))
+    known = {instType for instType, _ in INSTRUCTIONS.values()}
+
+    if unknown := [instType for instType in types if instType not in known]:
+        raise argparse.ArgumentTypeError(f'unknown instruction types {",".join(unknown)}, known: {",".join(sorted(known))}')
+
+    return types
+
+def getRegressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+
+    for phase, seconds in results['phases'].items():
+        if (previous := baseline['phases'].get(phase)) is not None and seconds > previous * (1 + threshold):
+            regressions.append(f'{phase}: {seconds * 1000:.1f} ms against {previous * 1000:.1f} ms in the baseline')
+
+    return regressions
+
+def main() -> None:
+    argParser = argparse.ArgumentParser(description='Time the assembler phases on a synthetic program.')
+    argParser.add_argument('--insts', type=int, default=50_000, help='instructions in the main file')
+    argParser.add_argument('--data', type=int, default=5_000, help='data directives in the main file')
+    argParser.add_argument('--includes', type=int, default=4, help='included files, a tenth of the size each')
+    argParser.add_argument('--types', type=getTypes, help='instruction types to generate, comma separated (default: all)')
+    argParser.add_argument('--field-size', type=int, default=1000, help='items per .data or .inst field, 0 for one field')
+    argParser.add_argument('--jump-rate', type=float, default=0.05, help='fraction of jumps to labels, patched as fixups')
+    argParser.add_argument('--seed', type=int, default=0)
+    argParser.add_argument('--repeat', type=int, default=5, help='runs, the fastest one of each phase is kept')
+    argParser.add_argument('-o', '--output', help='write the results to this JSON file')
+    argParser.add_argument('--baseline', help='JSON results to compare against')
+    argParser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown against the baseline')
+    args = argParser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        fileName = synthetic.writeProgram(
+            directory, args.insts, args.data, args.includes, args.seed, fieldSize=args.field_size, types=args.types,
+            jumpRate=args.jump_rate
+        )
+        size = sum(entry.stat().st_size for entry in os.scandir(directory))
+        runs = [timePhases(fileName) for _ in range(args.repeat)]
+
+    results = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'config': {
+            'insts': args.insts, 'data': args.data, 'includes': args.includes, 'seed': args.seed, 'types': args.types,
+            'fieldSize': args.field_size, 'jumpRate': args.jump_rate,
+        },
+        'sourceBytes': size,
+        'phases': {phase: min(run[phase] for run in runs) for phase in runs[0]},
+    }
+
+    print(f'{size / 1_000_000:.2f} MB of source, best of {args.repeat}')
+
+    for phase, seconds in results['phases'].items():
+        print(f'{phase:>8}: {seconds * 1000:8.1f} ms ({size / seconds / 1_000_000:.2f} MB/s)')
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+        if baseline['config'] != results['config']:
+            sys.exit('Baseline was recorded with a different configuration: ' + json.dumps(baseline['config']))
+
+        if regressions := getRegressions(results, baseline, args.threshold):
+            print('Regressions:\n  ' + '\n  '.join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+        print(f'No phase slower than the baseline by more than {args.threshold:.0%}')
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,27 @@
+# Benchmark: tokens per second of the character by character scanner against the regex scanner
+# Usage: python3 bench/bench_scanner.py [size in MB]
+import sys
+import time
+
+import synthetic
+from asm_scanner import Scanner
+
+
+def timeScanner(source: str, useRegex: bool) -> tuple[int, float]:
+    start = time.perf_counter()
+    tokenCount = len(Scanner(source, useRegex).getTokenStream())
+
+    return tokenCount, time.perf_counter() - start
+
+def main() -> None:
+    sizeMb = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    source = synthetic.generateSized(int(sizeMb * 1_000_000))
+
+    print(f'Source: {len(source) / 1_000_000:.1f} MB')
+
+    for name, useRegex in (('char loop', False), ('regex', True)):
+        tokenCount, elapsed = timeScanner(source, useRegex)
+        print(f'{name:>10}: {tokenCount} tokens in {elapsed:.2f} s ({tokenCount / elapsed:,.0f} tokens/s)')
+
+
+if __name__ == '__main__': main()
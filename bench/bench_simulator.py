@@ -0,0 +1,53 @@
+# Benchmark: instructions per second of the block compiling engine, the pre-decoded interpreter and decoding every step
+# Usage: python3 bench/bench_simulator.py
+import time
+
+import synthetic
+from compiler import compile
+from simulator import Simulator, BlockSimulator
+
+
+# Counts AC0 down from 65535, incrementing AC2 and shuffling registers on every iteration
+LOOP_PROGRAM = '''
+.inst
+    lli &0, 255
+    lui &0, 255
+    lsi &2, 0
+    _loop: addi &2, 1
+    mfac &2, $1
+    add &3, $1, $2
+    mfac &3, $2
+    subi &0, 1
+    bnez &0, 3
+    _end: jump _end
+'''
+
+def main() -> None:
+    code = compile(LOOP_PROGRAM).code
+
+    simulator = Simulator(code)
+    start = time.perf_counter()
+    simulator.run(10_000_000)
+    runTime = time.perf_counter() - start
+
+    blockSimulator = BlockSimulator(code)
+    start = time.perf_counter()
+    blockSimulator.run(10_000_000)
+    blockTime = time.perf_counter() - start
+
+    reference = Simulator(code)
+    start = time.perf_counter()
+    while not reference.halted:
+        reference.step()
+    stepTime = time.perf_counter() - start
+
+    assert (simulator.ac, simulator.rf, simulator.steps) == (reference.ac, reference.rf, reference.steps)
+    assert (blockSimulator.ac, blockSimulator.rf, blockSimulator.steps) == (reference.ac, reference.rf, reference.steps)
+
+    print(f'{simulator.steps} instructions')
+    print(f'decode every step: {reference.steps / stepTime:,.0f} insts/s')
+    print(f'      pre-decoded: {simulator.steps / runTime:,.0f} insts/s')
+    print(f'   compiled block: {blockSimulator.steps / blockTime:,.0f} insts/s')
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,35 @@
+# Benchmark: peak traced memory and time of assembling and writing a program with large .space regions
+# Usage: python3 bench/bench_space.py [reserved MB]
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import synthetic
+from compiler import compile
+from loader import writeBinary, writeHexText
+
+
+def main() -> None:
+    reserved = int(float(sys.argv[1]) * 1_000_000) if len(sys.argv) > 1 else 100_000_000
+    source = f'.data\n    .word 1\n    .space {reserved // 2}\n    .word 2\n    .space {reserved // 2}\n.inst\n    nope\n'
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, writer in (('bin', writeBinary), ('hex', writeHexText)):
+            tracemalloc.start()
+            start = time.perf_counter()
+
+            code = compile(source)
+            assembled = tracemalloc.get_traced_memory()[0]
+            writer(code, os.path.join(directory, 'out.' + name))
+
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print(f'{name}: {reserved / 1_000_000:.0f} MB reserved, {assembled / 1_000:.1f} kB after assembling, '
+                  f'peak {peak / 1_000_000:.1f} MB writing, {elapsed:.2f} s')
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,44 @@
+# Benchmark: peak traced memory and time of writing a binary image through compile against a streaming CodeStream
+# Usage: python3 bench/bench_stream.py [instructions] [field size]
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import synthetic
+from compiler import compile, CodeStream
+from loader import writeBinary, writeBinaryStream
+
+
+def measure(write) -> tuple[float, int]: # Seconds, peak traced bytes
+    tracemalloc.start()
+    start = time.perf_counter()
+    write()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+def main() -> None:
+    instCount = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    fieldSize = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    source = synthetic.generate(instCount, instCount // 10, labelRate=0, fieldSize=fieldSize)
+
+    with tempfile.TemporaryDirectory() as directory:
+        wholePath = os.path.join(directory, 'whole.bin')
+        streamPath = os.path.join(directory, 'stream.bin')
+
+        wholeTime, wholePeak = measure(lambda: writeBinary(compile(source).code, wholePath))
+        streamTime, streamPeak = measure(lambda: writeBinaryStream(CodeStream(source), streamPath))
+
+        with open(wholePath, 'rb') as whole, open(streamPath, 'rb') as stream:
+            assert whole.read() == stream.read()
+
+    print(f'{len(source) / 1_000_000:.1f} MB of source, fields of {fieldSize} items (times under tracemalloc)')
+    print(f' compile: peak {wholePeak / 1_000_000:.1f} MB in {wholeTime:.2f} s')
+    print(f'  stream: peak {streamPeak / 1_000_000:.1f} MB in {streamTime:.2f} s')
+
+
+if __name__ == '__main__': main()
@@ -0,0 +1,39 @@
+# Benchmark: peak traced memory and time of parsing from a token list against parsing from the lazy token buffer
+# Usage: python3 bench/bench_tokens.py [size in MB]
+import sys
+import time
+import tracemalloc
+
+import synthetic
+from asm_scanner import Scanner
+from asm_parser import Parser
+
+
+def parseList(source: str) -> Parser:
+    return Parser(Scanner(source).getTokenStream())
+
+def parseLazy(source: str) -> Parser:
+    return Parser(Scanner(source, lazy=True).getTokenBuffer())
+
+def measure(parse, source: str) -> tuple[int, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    parse(source)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak, elapsed
+
+def main() -> None:
+    sizeMb = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    source = synthetic.generateSized(int(sizeMb * 1_000_000), fieldSize=200) # Short fields keep the recursive parser in bounds
+
+    print(f'Source: {len(source) / 1_000_000:.1f} MB')
+
+    for name, parse in (('list', parseList), ('lazy', parseLazy)):
+        peak, elapsed = measure(parse, source)
+        print(f'{name:>5}: peak {peak / 1_000_000:.1f} MB in {elapsed:.2f} s')
+
+
+if __name__ == '__main__': main()
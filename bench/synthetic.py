@@ -0,0 +1,148 @@
+# Synthetic MOOn-IV program generator used by the benchmarks
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils import INSTRUCTIONS, PSEUDO_INSTRUCTIONS
+
+
+def acReg(rng: random.Random) -> str:
+    return '&' + str(rng.choice((0, 2, 3))) # AC1 is reserved for the assembler
+
+def rfReg(rng: random.Random) -> str:
+    return '$' + str(rng.randrange(16))
+
+def makeInst(rng: random.Random, mnemonic: str) -> str:
+    match INSTRUCTIONS[mnemonic][0]:
+        case 'n':
+            return mnemonic
+        case 'r':
+            return f'{mnemonic} {acReg(rng)}, {rfReg(rng)}, {rfReg(rng)}'
+        case 'i':
+            return f'{mnemonic} {acReg(rng)}, {rng.randrange(256)}'
+        case 's':
+            return f'{mnemonic} {acReg(rng)}, {rfReg(rng)}, {rng.randrange(16)}'
+        case 'j':
+            return f'{mnemonic} {rng.randrange(256)}'
+        case 'e1':
+            return f'{mnemonic} {acReg(rng)}, {rfReg(rng)}'
+        case 'e2' | 'e4':
+            return f'{mnemonic} {rfReg(rng)}'
+        case 'e3':
+            return f'{mnemonic} {acReg(rng)}'
+
+def makeData(rng: random.Random) -> str:
+    match rng.randrange(4):
+        case 0:
+            return f'.space {rng.randrange(1, 8)}'
+        case 1:
+            return '.word ' + ', '.join(str(rng.randrange(65536)) for _ in range(rng.randrange(1, 4)))
+        case 2:
+            return '.byte ' + ', '.join(str(rng.randrange(256)) for _ in range(rng.randrange(1, 4)))
+        case 3:
+            return '.ascii "' + ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789._') for _ in range(rng.randrange(1, 12))) + '"'
+
+JUMP_TARGETS = 64 # Labelled instructions that jumps go to. Labels must resolve below word 1024, they start the program
+
+def generateTargets(rng: random.Random, labelPrefix: str = '') -> list[str]:
+    # Field of the jump targets, jumping between them to earlier and later labels
+    lines = ['.inst']
+
+    for index in range(JUMP_TARGETS):
+        if rng.random() < 0.5:
+            inst = f'jump _{labelPrefix}t{rng.randrange(JUMP_TARGETS)}'
+        else:
+            inst = 'nope'
+
+        lines.append(f'    _{labelPrefix}t{index}: {inst}')
+
+    return lines
+
+def generate(instCount: int, dataCount: int = 0, seed: int = 0, labelRate: float = 0.1, commentRate: float = 0.1,
+             fieldSize: int = 0, types: tuple[str, ...] | None = None, labelPrefix: str = '', jumpRate: float = 0,
+             targetPrefix: str | None = None) -> str:
+    # fieldSize > 0 starts a new .data/.inst field every fieldSize items. types limits the instruction types used
+    # (all of them by default), labelPrefix keeps the labels of files included together apart. jumpRate is the
+    # fraction of instructions that are jumps to labels, those of generateTargets: the program starts with them, or
+    # they are defined with targetPrefix in another file, one placed at the start of the program
+    rng = random.Random(seed)
+    mnemonics = [
+        mnemonic for mnemonic, (instType, _) in INSTRUCTIONS.items()
+        if mnemonic not in PSEUDO_INSTRUCTIONS and (types is None or instType in types)
+    ]
+    lines = []
+    labelCount = 0
+
+    if jumpRate and targetPrefix is None:
+        lines += generateTargets(rng, labelPrefix)
+        targetPrefix = labelPrefix
+
+    if dataCount > 0:
+        lines.append('.data')
+
+        for index in range(dataCount):
+            prefix = ''
+
+            if fieldSize and index and index % fieldSize == 0:
+                lines.append('.data')
+
+            if rng.random() < labelRate:
+                prefix = f'_{labelPrefix}d{labelCount}: '
+                labelCount += 1
+
+            lines.append('    ' + prefix + makeData(rng))
+
+    lines.append('.inst')
+
+    for index in range(instCount):
+        prefix = ''
+        suffix = ''
+
+        if fieldSize and index and index % fieldSize == 0:
+            lines.append('.inst')
+
+        if rng.random() < labelRate:
+            prefix = f'_{labelPrefix}l{labelCount}: '
+            labelCount += 1
+
+        if rng.random() < commentRate:
+            suffix = ' # synthetic comment'
+
+        if jumpRate and rng.random() < jumpRate:
+            inst = f'jump _{targetPrefix}t{rng.randrange(JUMP_TARGETS)}'
+        else:
+            inst = makeInst(rng, rng.choice(mnemonics))
+
+        lines.append('    ' + prefix + inst + suffix)
+
+    return '\n'.join(lines) + '\n'
+
+def generateSized(size: int, seed: int = 0, fieldSize: int = 0) -> str: # Generate a program of roughly size characters
+    return generate(size // 20, size // 400, seed, fieldSize=fieldSize)
+
+def writeProgram(directory: str, instCount: int, dataCount: int = 0, includeCount: int = 0, seed: int = 0,
+                 **options) -> str: # Write a program including includeCount generated files, returns its path
+    # With jumps the includes go last and jump to the targets the main file starts with
+    jumps = bool(options.get('jumpRate'))
+    lines = []
+
+    for index in range(includeCount):
+        includeName = f'include{index}.s'
+
+        with open(os.path.join(directory, includeName), 'w') as f:
+            f.write(generate(
+                instCount // 10, dataCount // 10, seed + 1 + index, labelPrefix=f'i{index}_',
+                targetPrefix='' if jumps else None, **options
+            ))
+
+        lines.append(f'.include "{includeName}" # synthetic include\n')
+
+    fileName = os.path.join(directory, 'main.s')
+    source = generate(instCount, dataCount, seed, **options)
+
+    with open(fileName, 'w') as f:
+        f.write(source + ''.join(lines) if jumps else ''.join(lines) + source)
+
+    return fileName
@@ -1,6 +1,6 @@
 # function to make until 1024 lines
 def fillTo1024Lines(compiledText: str) -> str:
-    compiledText += (1025 - len(compiledText.split('\n'))) * '0000000000000000\n'
+    compiledText += (1024 - compiledText.count('\n')) * '0000000000000000\n' # Count lines without splitting the text
     
     return compiledText
 
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from utils import VERSION, INSTS_FILE, PSEUDO_INSTS_FILE, ObjectCode
+
+
+def getTablesDigest() -> str: # Hash of the instruction tables, part of every cache key
+    digest = hashlib.sha256()
+
+    for fileName in (INSTS_FILE, PSEUDO_INSTS_FILE):
+        with open(fileName, 'rb') as file:
+            digest.update(file.read())
+
+    return digest.hexdigest()
+
+def getFileDigest(fileName: str) -> str | None:
+    try:
+        with open(fileName, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    except OSError:
+        return None
+
+
+class AssemblyCache: # On-disk cache of assembled object code, one JSON file per source, evicted least recently used first
+    def __init__(self, directory: str, maxSize: int = 64 * 1024 * 1024) -> None: # maxSize in bytes
+        self.directory = directory
+        self.maxSize = maxSize
+        self.tablesDigest = getTablesDigest()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+        # Running total of the entries. Other processes sharing the directory aren't counted, so the limit is
+        # approximate: evict scans the directory for the real total before removing anything
+        self.size = sum(entry.stat().st_size for entry in self.getEntries())
+
+    def getKey(self, source: str | bytes, fileName: str | None) -> str: # source as text or as its UTF-8 bytes
+        # Includes are resolved from the file's directory, so the same source elsewhere is a different entry
+        directory = os.path.dirname(os.path.realpath(fileName)) if fileName is not None else os.getcwd()
+
+        digest = hashlib.sha256()
+        digest.update(VERSION.encode())
+        digest.update(self.tablesDigest.encode())
+        digest.update(directory.encode())
+        digest.update(b'\0')
+        digest.update(source.encode() if isinstance(source, str) else source)
+
+        return digest.hexdigest()
+
+    def getPath(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def getEntries(self) -> list[os.DirEntry]: # Entry files, other processes may remove them at any point
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+
+    def get(self, key: str) -> ObjectCode | None: # None on a miss, or when an included file has changed since
+        path = self.getPath(key)
+
+        try:
+            with open(path, 'r') as file:
+                entry = json.load(file)
+
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        for includePath, includeDigest in entry['includes'].items():
+            if getFileDigest(includePath) != includeDigest:
+                self.misses += 1
+                return None
+
+        try:
+            os.utime(path) # Mark as recently used
+        except FileNotFoundError: # Evicted by another process since it was read
+            pass
+
+        code = ObjectCode.unpack((
+            bytes.fromhex(entry['code']),
+            entry['offsets'],
+            [tuple(fixup) for fixup in entry['fixups']],
+            entry['includes'],
+            [(bytes.fromhex(data), zeros) for data, zeros in entry.get('parts', [])], # Zero extents
+        ))
+
+        self.hits += 1
+
+        return code
+
+    def put(self, key: str, code: ObjectCode) -> None:
+        entry = {
+            'code': code.data.hex(),
+            'parts': [(data.hex(), zeros) for data, zeros in code.parts],
+            'offsets': code.offsets,
+            'fixups': code.fixups,
+            'includes': code.includes,
+        }
+
+        path = self.getPath(key)
+
+        try:
+            self.size -= os.path.getsize(path) # Replaced below
+        except FileNotFoundError:
+            pass
+
+        # A temporary file of its own, so processes storing the same key don't write into each other's
+        fd, tempPath = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+
+        try:
+            with os.fdopen(fd, 'w') as file:
+                size = file.write(json.dumps(entry, separators=(',', ':'))) # ASCII, as many bytes as characters
+
+            os.replace(tempPath, path) # Atomic, so a concurrent reader never sees a partial entry
+
+        except BaseException:
+            os.remove(tempPath)
+            raise
+
+        self.size += size
+
+        if self.size > self.maxSize:
+            self.evict()
+
+    def evict(self) -> None: # Remove least recently used entries until the cache fits in maxSize
+        entries = []
+
+        for entry in self.getEntries():
+            try:
+                entries.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+            except FileNotFoundError: # Evicted by another process meanwhile
+                pass
+
+        self.size = sum(size for _, size, _ in entries) # Including what other processes have stored
+
+        for _, size, path in sorted(entries):
+            if self.size <= self.maxSize:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            else:
+                self.evictions += 1
+
+            self.size -= size
+
+    def getStats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': self.size}
@@ -0,0 +1,61 @@
+from utils import INSTRUCTIONS, SemanticError, Node
+
+
+# Instruction word: 6 bit opcode followed by 10 bits of fields. Each type lists its operands as (kind, shift, maximum)
+FIELD_LAYOUTS = {
+    'n': (),
+    'r': (('acReg', 8, 3), ('rfReg', 4, 15), ('rfReg', 0, 15)),
+    'i': (('acReg', 8, 3), ('number', 0, 255)),
+    's': (('acReg', 8, 3), ('rfReg', 4, 15), ('number', 0, 15)),
+    'j': (('number', 0, 1023),),
+    'e1': (('acReg', 8, 3), ('rfReg', 4, 15)),
+    'e2': (('rfReg', 0, 15),),
+    'e3': (('acReg', 8, 3),),
+    'e4': (('rfReg', 4, 15),),
+}
+
+
+def getOpcodes() -> dict: # mnemonic -> (opcode already shifted into place, field layout)
+    return {
+        mnemonic: (int(opcode, 2) << 10, FIELD_LAYOUTS[instType])
+        for mnemonic, (instType, opcode) in INSTRUCTIONS.items()
+    }
+
+
+OPCODES = getOpcodes()
+
+
+def encodeInst(node: Node) -> int: # Pack an instruction node into a 16 bit integer
+    word, layout = OPCODES[node.lexeme]
+
+    for (kind, shift, maximum), child in zip(layout, node.children):
+        if kind == 'number':
+            value = int(child.lexeme)
+
+            if value < 0 or value > maximum:
+                raise SemanticError('Number out of bounds. Must be between 0 and ' + str(maximum) + '.', child.offset)
+
+        elif kind == 'acReg':
+            value = int(child.lexeme[1:])
+
+            if value > maximum:
+                raise SemanticError('AC register out of bounds.', child.offset)
+
+            if value == 1:
+                raise SemanticError('AC register 1 is reserved for the assembler.', child.offset) # AC1 is unavailable for writing
+
+        else:
+            value = int(child.lexeme[1:])
+
+            if value > maximum:
+                raise SemanticError('RF register out of bounds.', child.offset)
+
+        word |= value << shift
+
+    return word
+
+def emitInst(code: bytearray, node: Node) -> None: # Encode an instruction straight into the output buffer
+    word = encodeInst(node)
+
+    code.append(word >> 8)
+    code.append(word & 0xFF)
@@ -0,0 +1,94 @@
+from array import array
+
+from utils import NODE_TYPES, NODE_KINDS
+
+
+NO_OFFSET = 0xFFFFFFFF # Stored for nodes without an offset, read back as None like Node's default
+
+class FlatAst: # AST in parallel arrays, nodes in preorder. A node's subtree ends where ends says
+    def __init__(self) -> None:
+        self.kinds = array('B') # Node kind, as in Node.kind
+        self.lexemes = array('I') # Index into pool
+        self.ends = array('I') # Index after the last node of the subtree
+        self.offsets = array('I') # Source offset of the node's token
+        self.pool: list[str] = [] # Distinct lexemes, most repeat: mnemonics, registers, small numbers
+        self.poolIndex: dict[str, int] = {}
+        self.stack: list[int] = [] # Open nodes
+
+        self.openNode(NODE_KINDS['Program'], '\0', 0)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def intern(self, lexeme: str) -> int:
+        if (index := self.poolIndex.get(lexeme)) is None:
+            index = self.poolIndex[lexeme] = len(self.pool)
+            self.pool.append(lexeme)
+
+        return index
+
+    def addLeaf(self, kind: int, lexeme: str = '\0', offset: int | None = None) -> None:
+        self.kinds.append(kind)
+        self.lexemes.append(self.intern(lexeme))
+        self.ends.append(len(self.kinds))
+        self.offsets.append(NO_OFFSET if offset is None else offset)
+
+    def openNode(self, kind: int, lexeme: str = '\0', offset: int | None = None) -> None: # Following nodes are its children until closeNode
+        self.stack.append(len(self.kinds))
+        self.kinds.append(kind)
+        self.lexemes.append(self.intern(lexeme))
+        self.ends.append(0)
+        self.offsets.append(NO_OFFSET if offset is None else offset)
+
+    def closeNode(self) -> None:
+        self.ends[self.stack.pop()] = len(self.kinds)
+
+    def getAst(self): # Cursor on the root, closing the nodes still open
+        while self.stack:
+            self.closeNode()
+
+        return FlatNode(self, 0)
+
+    def getSize(self) -> int: # Bytes of the arrays, without the lexeme pool
+        return sum(buffer.itemsize * len(buffer) for buffer in (self.kinds, self.lexemes, self.ends, self.offsets))
+
+
+class FlatNode: # Cursor on a node of a FlatAst, read like a Node
+    __slots__ = ('ast', 'index')
+
+    def __init__(self, ast: FlatAst, index: int) -> None:
+        self.ast = ast
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f'{self.type}({self.lexeme}) -> {self.children}'
+
+    @property
+    def kind(self) -> int:
+        return self.ast.kinds[self.index]
+
+    @property
+    def type(self) -> str:
+        return NODE_TYPES[self.ast.kinds[self.index]]
+
+    @property
+    def lexeme(self) -> str:
+        return self.ast.pool[self.ast.lexemes[self.index]]
+
+    @property
+    def offset(self) -> int | None:
+        return None if (offset := self.ast.offsets[self.index]) == NO_OFFSET else offset
+
+    @property
+    def children(self) -> list: # Cursors on the children, made on each access
+        ast = self.ast
+        ends = ast.ends
+        children = []
+        index = self.index + 1
+        end = ends[self.index]
+
+        while index < end:
+            children.append(FlatNode(ast, index))
+            index = ends[index]
+
+        return children
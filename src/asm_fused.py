@@ -0,0 +1,176 @@
+import re
+
+from utils import ALPHABET, SYMBOLS, TOKEN_ENDS, SemanticError, ObjectCode
+from asm_encoder import OPCODES
+
+
+# Single pass assembler for plain sources: one statement per line, recognized and encoded straight into the object
+# code. Anything it doesn't recognize makes it give up, and the source goes through the full pipeline instead, which
+# also reports the errors. It never accepts a source the pipeline would reject.
+STATEMENT_PATTERN = re.compile(r'[ \t]*(?:(_[a-z0-9_]+)[ \t]*:[ \t]*)?(?:(\.?[a-z]+)(?:[ \t]+([^ \t].*?))?)?[ \t]*')
+OPERAND_PATTERNS = {
+    'acReg': re.compile(r'[ \t]*&(0|[1-9][0-9]*)[ \t]*'),
+    'rfReg': re.compile(r'[ \t]*\$(0|[1-9][0-9]*)[ \t]*'),
+    'number': re.compile(r'[ \t]*([0-9]+)[ \t]*'),
+}
+LABEL_PATTERN = re.compile(r'[ \t]*(_[a-z0-9_]+)[ \t]*')
+STRING_PATTERN = re.compile('"[' + re.escape(''.join(char for char in ALPHABET if char not in SYMBOLS + '"')) + ']*"')
+
+DATA_SIZES = {'.word': 0xFFFF, '.byte': 0xFF}
+
+
+class GiveUp(Exception): # The source needs the full pipeline
+    pass
+
+
+def encodeOperands(mnemonic: str, operands: str | None) -> int:
+    word, layout = OPCODES[mnemonic]
+
+    if not layout:
+        if operands is not None:
+            raise GiveUp()
+
+        return word
+
+    if operands is None or len(parts := operands.split(',')) != len(layout):
+        raise GiveUp()
+
+    for (kind, shift, maximum), part in zip(layout, parts):
+        if (match := OPERAND_PATTERNS[kind].fullmatch(part)) is None:
+            raise GiveUp()
+
+        value = int(match[1])
+
+        if value > maximum or (kind == 'acReg' and value == 1): # Left to the encoder to report
+            raise GiveUp()
+
+        word |= value << shift
+
+    return word
+
+def assembleData(code: ObjectCode, directive: str, operands: str | None) -> None:
+    if operands is None:
+        raise GiveUp()
+
+    if directive == '.ascii':
+        if STRING_PATTERN.fullmatch(operands) is None:
+            raise GiveUp()
+
+        code.extend(operands[1:-1].encode('ascii'))
+        return
+
+    numbers = []
+
+    for part in operands.split(','):
+        if (match := OPERAND_PATTERNS['number'].fullmatch(part)) is None:
+            raise GiveUp()
+
+        numbers.append(int(match[1]))
+
+    if directive == '.space':
+        if len(numbers) != 1:
+            raise GiveUp()
+
+        code.reserve(numbers[0])
+
+    elif directive in DATA_SIZES:
+        if max(numbers) > DATA_SIZES[directive]:
+            raise GiveUp()
+
+        for number in numbers:
+            if directive == '.word':
+                code.appendWord(number)
+            else:
+                code.append(number)
+
+    else:
+        raise GiveUp()
+
+def assembleLine(code: ObjectCode, line: str, state: list, offset: int) -> None:
+    # state: [current field ('.data', '.inst' or None), whether it has items yet, whether a label waits for its item].
+    # offset is where the line starts in the source
+    if (commentIndex := line.find('#')) != -1:
+        if commentIndex and line[commentIndex - 1] not in TOKEN_ENDS: # Would be part of the token before it
+            raise GiveUp()
+
+        line = line[:commentIndex]
+
+    if (match := STATEMENT_PATTERN.fullmatch(line)) is None:
+        raise GiveUp()
+
+    label, name, operands = match.groups()
+
+    if label is not None:
+        if state[2]: # Two labels in a row
+            raise GiveUp()
+
+        try:
+            code.addLabel(label)
+        except SemanticError:
+            raise GiveUp()
+
+        state[2] = True
+
+    if name is None:
+        return
+
+    if name == '.data' or name == '.inst':
+        if label is not None or operands is not None or state[2] or (state[0] is not None and not state[1]):
+            raise GiveUp()
+
+        state[0], state[1] = name, False
+        return
+
+    if state[0] == '.inst' and name in OPCODES:
+        if name == 'jump' and operands is not None and (target := LABEL_PATTERN.fullmatch(operands)) is not None:
+            code.addFixup(target[1], offset + match.start(3) + target.start(1))
+            code.appendWord(OPCODES['jump'][0])
+        else:
+            code.appendWord(encodeOperands(name, operands))
+
+    elif state[0] == '.data' and name[0] == '.':
+        assembleData(code, name, operands)
+
+    else:
+        raise GiveUp()
+
+    state[1] = True
+    state[2] = False
+
+def iterLines(input): # (offset, line) of the source text, or of its bytes decoded one line at a time
+    # Offsets count characters of a str and bytes otherwise, as the scanner's do
+    start = 0
+
+    if isinstance(input, str):
+        for line in input.split('\n'):
+            yield start, line
+            start += len(line) + 1
+
+        return
+
+    # Invalid UTF-8 is replaced, it can only be in comments or in something the pipeline rejects anyway
+    while (end := input.find(b'\n', start)) != -1:
+        yield start, str(input[start:end], 'utf-8', 'replace')
+        start = end + 1
+
+    yield start, str(input[start:], 'utf-8', 'replace')
+
+def assembleFused(input: str | bytes) -> ObjectCode | None: # Object code with labels unresolved, None if it gives up
+    # input is the source text, or its bytes, possibly memory-mapped
+    if input.find('\0' if isinstance(input, str) else b'\0') != -1:
+        return None
+
+    code = ObjectCode()
+    state = [None, False, False]
+
+    try:
+        for offset, line in iterLines(input):
+            assembleLine(code, line, state, offset)
+
+    except GiveUp:
+        return None
+
+    if state[2] or (state[0] is not None and not state[1]): # Label or field without an item at the end
+        return None
+
+    return code
@@ -1,10 +1,10 @@
 from utils import INSTRUCTIONS, PSEUDO_INSTRUCTIONS, DATA_TYPES, Node, SyntacticError
+from asm_scanner import TokenBuffer
 
 
 class Parser:
-    def __init__(self, tokenStream: list) -> None:
-        self.tokenStream = tokenStream
-        self.index = 0
+    def __init__(self, tokenStream: list | TokenBuffer) -> None: # Accepts a token list or a lazy token buffer
+        self.tokens = tokenStream if isinstance(tokenStream, TokenBuffer) else TokenBuffer(tokenStream)
         self.ast = None
 
         self.parse()
@@ -12,27 +12,27 @@ class Parser:
     def getAst(self) -> Node:
         return self.ast
     
-    def getCurrentToken(self) -> str:
-        return self.tokenStream[self.index]
+    def getCurrentToken(self) -> tuple:
+        return self.tokens.getCurrentToken()
     
-    def peekNextToken(self) -> str:
-        return self.tokenStream[self.index + 1]
+    def peekNextToken(self) -> tuple:
+        return self.tokens.peekNextToken()
     
     def advance(self) -> None:
-        self.index += 1
+        self.tokens.advance()
 
     def matchLabel(self, expectedLabel) -> None:
         if (currentTokenLabel := self.getCurrentToken()[0]) == expectedLabel:
             self.advance()
 
         else:
-            raise SyntacticError('Expected ' + expectedLabel + '. Got "' + currentTokenLabel + '"')
+            raise SyntacticError('Expected ' + expectedLabel + '. Got "' + currentTokenLabel + '"', self.getCurrentToken()[2])
 
     def parse(self) -> None:
         self.ast = self.program()
 
     def program(self) -> Node:
-        node = Node('Program')
+        node = Node('Program', '\0', 0)
 
         while (currentToken := self.getCurrentToken()[0]) != 'EOF':
             if currentToken == 'dataDir':
@@ -51,14 +51,14 @@ class Parser:
     
     def includeDir(self) -> Node:
         if self.getCurrentToken()[0] == 'includeDir':
-            node = Node('Include')
+            node = Node('Include', '\0', self.getCurrentToken()[2])
             self.advance()
         
         else:
             raise Exception('SYNTACTICAL ERROR: unexpected token. Expected ".include". Got "' + self.getCurrentToken()[0] + '"')
         
         if (tokenLabel := self.getCurrentToken()[0]) == 'string':
-            node.addChild(Node('String', self.getCurrentToken()[1]))
+            node.addChild(Node('String', self.getCurrentToken()[1], self.getCurrentToken()[2]))
             self.advance()
 
         else:
@@ -68,7 +68,7 @@ class Parser:
     
     def dataField(self) -> Node:
         if self.getCurrentToken()[0] == 'dataDir':
-            node = Node('Data Field')
+            node = Node('Data Field', '\0', self.getCurrentToken()[2])
             self.advance()
 
         else:
@@ -114,7 +114,7 @@ class Parser:
             
     def space(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'spaceDir':
-            node = Node('Space')
+            node = Node('Space', '\0', self.getCurrentToken()[2])
             self.advance()
 
         else:
@@ -126,7 +126,7 @@ class Parser:
     
     def word(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'wordDir':
-            node = Node('Word')
+            node = Node('Word', '\0', self.getCurrentToken()[2])
             self.advance()
         
         else:
@@ -147,7 +147,7 @@ class Parser:
     
     def byte(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'byteDir':
-            node = Node('Byte')
+            node = Node('Byte', '\0', self.getCurrentToken()[2])
             self.advance()
         
         else:
@@ -168,7 +168,7 @@ class Parser:
     
     def ascii(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'asciiDir':
-            node = Node('ASCII')
+            node = Node('ASCII', '\0', self.getCurrentToken()[2])
             self.advance()
         
         else:
@@ -180,7 +180,7 @@ class Parser:
     
     def string(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'string':
-            node = Node('String', self.getCurrentToken()[1])
+            node = Node('String', self.getCurrentToken()[1], self.getCurrentToken()[2])
             self.advance()
 
         else:
@@ -190,7 +190,7 @@ class Parser:
     
     def number(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'number':
-            node = Node('Number', self.getCurrentToken()[1])
+            node = Node('Number', self.getCurrentToken()[1], self.getCurrentToken()[2])
             self.advance()
 
         else:
@@ -200,7 +200,7 @@ class Parser:
 
     def instField(self) -> Node:
         if self.getCurrentToken()[0] == 'instDir':
-            node = Node('Inst Field')
+            node = Node('Inst Field', '\0', self.getCurrentToken()[2])
             self.advance()
 
         else:
@@ -215,7 +215,7 @@ class Parser:
     def instList(self) -> list[Node]:
         instList = []
 
-        tokenLabel, tokenLexeme = self.getCurrentToken()
+        tokenLabel, tokenLexeme, _ = self.getCurrentToken()
 
         if tokenLabel == 'mnemonic':
             if tokenLexeme in PSEUDO_INSTRUCTIONS:
@@ -225,7 +225,11 @@ class Parser:
         
         elif tokenLabel == 'label':
             instList.append(self.labelDec())
-            instList.append(self.inst())
+
+            if self.getCurrentToken()[1] in PSEUDO_INSTRUCTIONS: # Labeled pseudo instructions, as in the README grammar
+                instList.append(self.pseudoInst())
+            else:
+                instList.append(self.inst())
 
         if (self.getCurrentToken()[0] == 'mnemonic') or (self.getCurrentToken()[0] == 'label'):
             for inst in self.instList():
@@ -234,13 +238,13 @@ class Parser:
         return instList
     
     def inst(self) -> Node:
-        tokenLabel, tokenLexeme = self.getCurrentToken()
+        tokenLabel, tokenLexeme, offset = self.getCurrentToken()
 
         if tokenLabel != 'mnemonic':
-            raise SyntacticError('Expected mnemonic. Got "' + tokenLabel + '"')
+            raise SyntacticError('Expected mnemonic. Got "' + tokenLabel + '"', offset)
 
         if tokenLexeme not in INSTRUCTIONS:
-            raise SyntacticError('Invalid mnemonic: ' + tokenLexeme)
+            raise SyntacticError('Invalid mnemonic: ' + tokenLexeme, offset)
         
         instType = INSTRUCTIONS[tokenLexeme][0]
         
@@ -267,13 +271,13 @@ class Parser:
                 raise SyntacticError('Dude, how did you get here? :O - Please report this issue on GitHub.')
 
     def nTypeInst(self, mnemonic) -> Node:
-        node = Node('N Type Inst', mnemonic)
+        node = Node('N Type Inst', mnemonic, self.getCurrentToken()[2])
         self.advance()
 
         return node
 
     def rTypeInst(self, mnemonic) -> Node:
-        node = Node('R Type Inst', mnemonic)
+        node = Node('R Type Inst', mnemonic, self.getCurrentToken()[2])
         self.advance()
         node.addChild(self.acReg())
         self.matchLabel('comma')
@@ -284,7 +288,7 @@ class Parser:
         return node
     
     def iTypeInst(self, mnemonic) -> Node:
-        node = Node('I Type Inst', mnemonic)
+        node = Node('I Type Inst', mnemonic, self.getCurrentToken()[2])
         self.advance()
         node.addChild(self.acReg())
         self.matchLabel('comma')
@@ -293,7 +297,7 @@ class Parser:
         return node
     
     def sTypeInst(self, mnemonic) -> Node:
-        node = Node('S Type Inst', mnemonic)
+        node = Node('S Type Inst', mnemonic, self.getCurrentToken()[2])
         self.advance()
         node.addChild(self.acReg())
         self.matchLabel('comma')
@@ -304,14 +308,14 @@ class Parser:
         return node
     
     def jTypeInst(self, mnemonic) -> Node:
-        node = Node('J Type Inst', mnemonic)
+        node = Node('J Type Inst', mnemonic, self.getCurrentToken()[2])
         self.advance()
         node.addChild(self.number())
 
         return node
     
     def e1TypeInst(self, mnemonic) -> Node:
-        node = Node('E1 Type Inst', mnemonic)
+        node = Node('E1 Type Inst', mnemonic, self.getCurrentToken()[2])
         self.advance()
         node.addChild(self.acReg())
         self.matchLabel('comma')
@@ -320,21 +324,21 @@ class Parser:
         return node
     
     def e2TypeInst(self, mnemonic) -> Node:
-        node = Node('E2 Type Inst', mnemonic)
+        node = Node('E2 Type Inst', mnemonic, self.getCurrentToken()[2])
         self.advance()
         node.addChild(self.rfReg())
 
         return node
     
     def e3TypeInst(self, mnemonic) -> Node:
-        node = Node('E3 Type Inst', mnemonic)
+        node = Node('E3 Type Inst', mnemonic, self.getCurrentToken()[2])
         self.advance()
         node.addChild(self.acReg())
 
         return node
     
     def e4TypeInst(self, mnemonic) -> Node:
-        node = Node('E4 Type Inst', mnemonic)
+        node = Node('E4 Type Inst', mnemonic, self.getCurrentToken()[2])
         self.advance()
         node.addChild(self.rfReg())
 
@@ -348,7 +352,7 @@ class Parser:
                 raise SyntacticError('How did you get here? :O - Please report this issue on GitHub.')
             
     def jump(self, lexeme) -> Node:
-        node = Node('Pseudo Jump', lexeme)
+        node = Node('Pseudo Jump', lexeme, self.getCurrentToken()[2])
         self.advance()
 
         if self.getCurrentToken()[0] == 'number':
@@ -356,12 +360,12 @@ class Parser:
         elif self.getCurrentToken()[0] == 'label':
             node.addChild(self.label())
         else:
-            raise SyntacticError('Expected number or label. Got "' + self.getCurrentToken()[0] + '"')
+            raise SyntacticError('Expected number or label. Got "' + self.getCurrentToken()[0] + '"', self.getCurrentToken()[2])
 
         return node
     
     # def e5TypeInst(self, mnemonic) -> Node: # todo: this will be implemented as a pseudo instruction
-    #     node = Node('E5 Type Inst', mnemonic)
+    #     node = Node('E5 Type Inst', mnemonic, self.getCurrentToken()[2])
     #     self.advance()
     #     node.addChild(self.acReg())
     #     self.matchLabel('comma')
@@ -374,7 +378,7 @@ class Parser:
 
     def labelDec(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'label':
-            node = Node('Label Dec', self.getCurrentToken()[1])
+            node = Node('Label Dec', self.getCurrentToken()[1], self.getCurrentToken()[2])
             self.advance()
 
             if self.getCurrentToken()[0] == 'colon':
@@ -390,7 +394,7 @@ class Parser:
     
     def label(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'label':
-            node = Node('Label', self.getCurrentToken()[1])
+            node = Node('Label', self.getCurrentToken()[1], self.getCurrentToken()[2])
             self.advance()
         
         else:
@@ -400,7 +404,7 @@ class Parser:
         
     def acReg(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'acReg':
-            node = Node('AC Reg', self.getCurrentToken()[1])
+            node = Node('AC Reg', self.getCurrentToken()[1], self.getCurrentToken()[2])
             self.advance()
 
         else:
@@ -410,7 +414,7 @@ class Parser:
         
     def rfReg(self) -> Node:
         if (tokenLabel := self.getCurrentToken()[0]) == 'rfReg':
-            node = Node('RF Reg', self.getCurrentToken()[1])
+            node = Node('RF Reg', self.getCurrentToken()[1], self.getCurrentToken()[2])
             self.advance()
         
         else:
@@ -1,14 +1,156 @@
 from utils import IGNORED_CHARS, SYMBOLS, ALPHABET, TOKEN_ENDS, DIRECTIVES, LexicalError
+from collections import deque
 import re
 
 
+# Master pattern used by the regex scanner. Every token class is a named group anchored to a token end, so one
+# finditer pass both splits and classifies the source. The 'invalid' group catches any other lexeme so the scanner
+# can raise the same errors as the character by character scanner.
+_END = r'(?=[' + re.escape(TOKEN_ENDS) + r']|\Z)'
+_STRING_CHARS = re.escape(''.join(char for char in ALPHABET if char not in SYMBOLS + '"'))
+
+MASTER_PATTERN = re.compile(
+    r'(?P<ignored>[' + re.escape(IGNORED_CHARS) + r']+)'
+    r'|(?P<comment>#[^\n]*)'
+    r'|(?P<comma>,)|(?P<colon>:)|(?P<lParen>\()|(?P<rParen>\))'
+    r'|(?P<directive>(?:' + '|'.join(re.escape(directive) for directive in DIRECTIVES) + r')' + _END + r')'
+    r'|(?P<number>[0-9]+' + _END + r')'
+    r'|(?P<string>"[' + _STRING_CHARS + r']*"' + _END + r')'
+    r'|(?P<label>_[a-z0-9_]+' + _END + r')'
+    r'|(?P<mnemonic>[a-z]+' + _END + r')'
+    r'|(?P<acReg>&(?:0|[1-9][0-9]*)' + _END + r')'
+    r'|(?P<rfReg>\$(?:0|[1-9][0-9]*)' + _END + r')'
+    r'|(?P<invalid>[^' + re.escape(TOKEN_ENDS) + r']+)'
+)
+
+# The same pattern over ASCII bytes, for sources scanned straight from a buffer such as a memory map
+MASTER_PATTERN_BYTES = re.compile(MASTER_PATTERN.pattern.encode('ascii'))
+
+
+class TokenBuffer: # Token source with a small lookahead buffer, fed by a list or a lazy token iterator
+    def __init__(self, tokens) -> None:
+        self.tokens = iter(tokens)
+        self.buffer = deque()
+
+    def fill(self, size: int) -> None: # Pull tokens until the buffer holds size tokens. EOF repeats once reached
+        while len(self.buffer) < size:
+            self.buffer.append(next(self.tokens, ('EOF', '\0', None)))
+
+    def getCurrentToken(self) -> tuple:
+        if not self.buffer:
+            self.fill(1)
+
+        return self.buffer[0]
+
+    def peekNextToken(self) -> tuple:
+        self.fill(2)
+
+        return self.buffer[1]
+
+    def advance(self) -> None:
+        if not self.buffer:
+            self.fill(1)
+
+        self.buffer.popleft()
+
+
 class Scanner:
-    def __init__(self, asmCode: str) -> None:
+    def __init__(self, asmCode, useRegex: bool = True, lazy: bool = False) -> None:
+        # asmCode is a str, or a bytes-like object (bytes, bytearray, mmap) scanned without decoding the whole of it
+        if not useRegex and not isinstance(asmCode, str): # The character by character scanner only reads str
+            asmCode = bytes(asmCode).decode()
+
         self.asmCode = asmCode
+        self.useRegex = useRegex
+        self.lazy = lazy
         self.tokenStream = []
         self.index = 0
 
-        self.makeTokenStream()
+        if lazy: # Tokens are only produced when the parser asks for them
+            return
+
+        if useRegex:
+            self.makeTokenStreamRegex()
+        else:
+            self.makeTokenStream()
+
+    def iterTokens(self): # Generate tokens on demand, ending with the EOF token. Tokens are (label, lexeme, offset)
+        # The offset of a token is where it starts in asmCode, lines and columns are only worked out for errors
+        if self.useRegex:
+            yield from self.iterTokensRegex() if isinstance(self.asmCode, str) else self.iterTokensBytes()
+            return
+
+        self.index = 0
+
+        while (token := self.getNextToken())[0] != 'EOF':
+            yield token
+
+        yield token
+
+    def iterTokensRegex(self): # Generate tokens in a single pass over the master pattern
+        asmCode = self.asmCode
+
+        # The character by character scanner reads a null character as EOF, so anything after it is ignored
+        if (endIndex := asmCode.find('\0')) == -1:
+            endIndex = len(asmCode)
+
+        for match in MASTER_PATTERN.finditer(asmCode, 0, endIndex):
+            tokenLabel = match.lastgroup
+
+            if tokenLabel == 'ignored' or tokenLabel == 'comment':
+                continue
+
+            lexeme = match.group()
+
+            if tokenLabel == 'directive':
+                tokenLabel = DIRECTIVES[lexeme]
+
+            elif tokenLabel == 'invalid':
+                for index, char in enumerate(lexeme):
+                    if char not in ALPHABET:
+                        raise LexicalError('Invalid character: ' + char, match.start() + index)
+
+                raise LexicalError('Invalid token: ' + lexeme, match.start())
+
+            yield (tokenLabel, lexeme, match.start())
+
+        self.index = endIndex
+        yield ('EOF', '\0', endIndex)
+
+    def iterTokensBytes(self): # iterTokensRegex over bytes. Only the lexemes of tokens that are kept are decoded
+        asmCode = self.asmCode
+
+        if (endIndex := asmCode.find(b'\0')) == -1:
+            endIndex = len(asmCode)
+
+        for match in MASTER_PATTERN_BYTES.finditer(asmCode, 0, endIndex):
+            tokenLabel = match.lastgroup
+
+            if tokenLabel == 'ignored' or tokenLabel == 'comment':
+                continue
+
+            if tokenLabel == 'invalid': # Other characters, possibly not ASCII
+                lexeme = match.group().decode('utf-8', 'replace')
+
+                for index, char in enumerate(lexeme):
+                    if char not in ALPHABET:
+                        offset = match.start() + len(lexeme[:index].encode()) # Offsets count bytes here
+                        raise LexicalError('Invalid character: ' + char, offset)
+
+                raise LexicalError('Invalid token: ' + lexeme, match.start())
+
+            lexeme = match.group().decode('ascii') # Every other group only matches ASCII
+
+            if tokenLabel == 'directive':
+                tokenLabel = DIRECTIVES[lexeme]
+
+            yield (tokenLabel, lexeme, match.start())
+
+        self.index = endIndex
+        yield ('EOF', '\0', endIndex)
+
+    def makeTokenStreamRegex(self) -> None: # Generate token stream with the regex scanner
+        self.tokenStream = list(self.iterTokens())
 
     def makeTokenStream(self) -> None: # Generate token stream
         while True:
@@ -21,27 +163,34 @@ class Scanner:
             self.tokenStream.append(token)
     
     def getNextToken(self) -> tuple: # Get next token
-        while self.getCurrentChar() in IGNORED_CHARS: # Ignore whitespaces
-            self.advance()
-        
-            if self.isEOF():
-                return ('EOF', self.getCurrentChar())
-        
-        if self.getCurrentChar() == '#': # Ignore comments
-            while self.getCurrentChar() != '\n':
+        while True: # Loop instead of recursing so long runs of comments don't hit the recursion limit
+            while self.getCurrentChar() in IGNORED_CHARS: # Ignore whitespaces
                 self.advance()
-
+            
                 if self.isEOF():
-                    return ('EOF', self.getCurrentChar())
+                    return ('EOF', self.getCurrentChar(), self.index)
+            
+            if self.getCurrentChar() != '#':
+                break
+
+            while self.getCurrentChar() != '\n': # Ignore comments
+                self.advance()
 
-            return self.getNextToken()
+                if self.isEOF():
+                    return ('EOF', self.getCurrentChar(), self.index)
         
         if self.isEOF(): # Return EOF token if end of file
-            return ('EOF', self.getCurrentChar())
+            return ('EOF', self.getCurrentChar(), self.index)
         
+        offset = self.index
         lexeme = self.getLexeme()
 
-        return (self.getTokenLabel(lexeme), lexeme)
+        try:
+            return (self.getTokenLabel(lexeme), lexeme, offset)
+
+        except LexicalError as e:
+            e.offset = offset
+            raise
 
     def advance(self) -> None: # Increment index by 1
         self.index += 1
@@ -66,7 +215,7 @@ class Scanner:
                 break
             
             if self.getCurrentChar() not in ALPHABET: # Check if the character is valid
-                raise Exception('LEXICAL ERROR - Invalid character: ' + self.getCurrentChar())
+                raise LexicalError('Invalid character: ' + self.getCurrentChar(), self.index)
             
             lexeme += self.getCurrentChar()
             self.advance()
@@ -111,5 +260,11 @@ class Scanner:
         else:
             raise LexicalError('Invalid token: ' + lexeme)
         
-    def getTokenStream(self) -> list:
+    def getTokenStream(self) -> list: # Compatibility path, a lazy scanner materializes the whole list here
+        if self.lazy and not self.tokenStream:
+            self.tokenStream = list(self.iterTokens())
+
         return self.tokenStream
+
+    def getTokenBuffer(self) -> TokenBuffer:
+        return TokenBuffer(self.iterTokens() if self.lazy else self.tokenStream)
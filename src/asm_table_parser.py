@@ -0,0 +1,304 @@
+from utils import INSTRUCTIONS, PSEUDO_INSTRUCTIONS, NODE_KINDS, Node, SyntacticError
+from asm_scanner import TokenBuffer
+from asm_flat_ast import FlatAst
+
+
+# Grammar symbols. Terminals are token labels, except mnemonics, which are split by the type column of INSTRUCTIONS
+# ('mnemonic.r', 'mnemonic.e1', ...) and pseudo instructions, which are their own terminal ('jump').
+class Leaf: # Match a terminal and add it as a leaf node of the current node
+    def __init__(self, terminal: str, nodeType: str) -> None:
+        self.terminal = terminal
+        self.nodeType = nodeType
+        self.kind = NODE_KINDS[nodeType]
+
+
+class Open: # Match a terminal, add a node for it and make it the current node until the matching CLOSE
+    def __init__(self, terminal: str, nodeType: str, keepLexeme: bool = False) -> None:
+        self.terminal = terminal
+        self.nodeType = nodeType
+        self.kind = NODE_KINDS[nodeType]
+        self.keepLexeme = keepLexeme
+
+
+CLOSE = 'CLOSE'
+
+# Operands of each instruction type, separated by commas in the source
+INST_OPERANDS = {
+    'n': (),
+    'r': (Leaf('acReg', 'AC Reg'), Leaf('rfReg', 'RF Reg'), Leaf('rfReg', 'RF Reg')),
+    'i': (Leaf('acReg', 'AC Reg'), Leaf('number', 'Number')),
+    's': (Leaf('acReg', 'AC Reg'), Leaf('rfReg', 'RF Reg'), Leaf('number', 'Number')),
+    'j': (Leaf('number', 'Number'),),
+    'e1': (Leaf('acReg', 'AC Reg'), Leaf('rfReg', 'RF Reg')),
+    'e2': (Leaf('rfReg', 'RF Reg'),),
+    'e3': (Leaf('acReg', 'AC Reg'),),
+    'e4': (Leaf('rfReg', 'RF Reg'),),
+}
+
+
+def getGrammar() -> dict: # BNF form of the EBNF grammar in README.md. Repetitions become right recursive tail rules
+    grammar = {
+        'program': [('items', 'EOF')],
+        'items': [('item', 'items'), ()],
+        'item': [('include',), ('dataField',), ('instField',)],
+
+        'include': [(Open('includeDir', 'Include'), Leaf('string', 'String'), CLOSE)],
+
+        'dataField': [(Open('dataDir', 'Data Field'), 'dataItem', 'dataList', CLOSE)],
+        'dataList': [('dataItem', 'dataList'), ()],
+        'dataItem': [('data',), ('labelDec', 'data')],
+        'data': [('space',), ('word',), ('ascii',), ('byte',)],
+
+        'space': [(Open('spaceDir', 'Space'), Leaf('number', 'Number'), CLOSE)],
+        'word': [(Open('wordDir', 'Word'), Leaf('number', 'Number'), 'numberTail', CLOSE)],
+        'byte': [(Open('byteDir', 'Byte'), Leaf('number', 'Number'), 'numberTail', CLOSE)],
+        'numberTail': [('comma', Leaf('number', 'Number'), 'numberTail'), ()],
+        'ascii': [(Open('asciiDir', 'ASCII'), Leaf('string', 'String'), CLOSE)],
+
+        'instField': [(Open('instDir', 'Inst Field'), 'instList', CLOSE)],
+        'instList': [('instItem', 'instList'), ()],
+        'instItem': [('inst',), ('labelDec', 'inst')],
+        'inst': [('pseudoInst',)],
+
+        'pseudoInst': [('jumpInst',)],
+        'jumpInst': [(Open('jump', 'Pseudo Jump', True), 'jumpTarget', CLOSE)],
+        'jumpTarget': [(Leaf('number', 'Number'),), (Leaf('label', 'Label'),)],
+
+        'labelDec': [(Leaf('label', 'Label Dec'), 'colon')],
+    }
+
+    for instType in sorted({instType for instType, _ in INSTRUCTIONS.values()}): # One rule per instruction type
+        terminal = 'mnemonic.' + instType
+        nodeType = instType.upper() + ' Type Inst'
+        operands = INST_OPERANDS[instType]
+
+        if operands:
+            rule = [Open(terminal, nodeType, True), operands[0]]
+
+            for operand in operands[1:]:
+                rule += ['comma', operand]
+
+            rule.append(CLOSE)
+
+        else:
+            rule = [Leaf(terminal, nodeType)]
+
+        grammar[instType + 'TypeInst'] = [tuple(rule)]
+        grammar['inst'].append((instType + 'TypeInst',))
+
+    return grammar
+
+def getTerminal(symbol, grammar: dict) -> str | None: # Terminal matched by a grammar symbol, None otherwise
+    if isinstance(symbol, (Leaf, Open)):
+        return symbol.terminal
+
+    if symbol == CLOSE:
+        return None
+
+    return None if symbol in grammar else symbol
+
+def getFirstSets(grammar: dict) -> dict:
+    first = {nonterminal: set() for nonterminal in grammar}
+    changed = True
+
+    while changed:
+        changed = False
+
+        for nonterminal, alternatives in grammar.items():
+            for alternative in alternatives:
+                alternativeFirst = getSequenceFirst(alternative, first, grammar)
+
+                if not alternativeFirst <= first[nonterminal]:
+                    first[nonterminal] |= alternativeFirst
+                    changed = True
+
+    return first
+
+def getSequenceFirst(sequence, first: dict, grammar: dict) -> set: # FIRST set of a symbol sequence. None stands for epsilon
+    result = set()
+
+    for symbol in sequence:
+        if symbol == CLOSE:
+            continue
+
+        if (terminal := getTerminal(symbol, grammar)) is not None:
+            result.add(terminal)
+            return result
+
+        result |= first[symbol] - {None}
+
+        if None not in first[symbol]:
+            return result
+
+    result.add(None)
+
+    return result
+
+def getFollowSets(grammar: dict, first: dict) -> dict:
+    follow = {nonterminal: set() for nonterminal in grammar}
+    changed = True
+
+    while changed:
+        changed = False
+
+        for nonterminal, alternatives in grammar.items():
+            for alternative in alternatives:
+                for index, symbol in enumerate(alternative):
+                    if symbol == CLOSE or getTerminal(symbol, grammar) is not None:
+                        continue
+
+                    restFirst = getSequenceFirst(alternative[index + 1:], first, grammar)
+                    newFollow = restFirst - {None}
+
+                    if None in restFirst:
+                        newFollow |= follow[nonterminal]
+
+                    if not newFollow <= follow[symbol]:
+                        follow[symbol] |= newFollow
+                        changed = True
+
+    return follow
+
+def getParseTable(grammar: dict) -> dict: # LL(1) table: nonterminal -> terminal -> alternative
+    first = getFirstSets(grammar)
+    follow = getFollowSets(grammar, first)
+    table = {nonterminal: {} for nonterminal in grammar}
+
+    for nonterminal, alternatives in grammar.items():
+        for alternative in alternatives:
+            alternativeFirst = getSequenceFirst(alternative, first, grammar)
+            lookaheads = alternativeFirst - {None}
+
+            if None in alternativeFirst:
+                lookaheads |= follow[nonterminal]
+
+            for terminal in lookaheads:
+                if terminal in table[nonterminal]:
+                    raise SyntacticError('Grammar is not LL(1): conflict in ' + nonterminal + ' on ' + terminal)
+
+                table[nonterminal][terminal] = tuple(reversed(alternative)) # Reversed, ready to be pushed on the stack
+
+    return table
+
+def getMnemonicTerminals() -> dict:
+    terminals = {mnemonic: 'mnemonic.' + instType for mnemonic, (instType, _) in INSTRUCTIONS.items()}
+
+    for pseudoInst in PSEUDO_INSTRUCTIONS:
+        terminals[pseudoInst] = pseudoInst
+
+    return terminals
+
+
+GRAMMAR = getGrammar()
+PARSE_TABLE = getParseTable(GRAMMAR)
+MNEMONIC_TERMINALS = getMnemonicTerminals()
+
+
+class TreeBuilder: # Builds the AST out of Node objects. FlatAst has the same methods for the flat layout
+    def __init__(self) -> None:
+        self.root = Node('Program', '\0', 0)
+        self.stack = [self.root]
+
+    def addLeaf(self, kind: int, lexeme: str = '\0', offset: int | None = None) -> None:
+        self.stack[-1].addChild(Node(kind, lexeme, offset))
+
+    def openNode(self, kind: int, lexeme: str = '\0', offset: int | None = None) -> None:
+        node = Node(kind, lexeme, offset)
+        self.stack[-1].addChild(node)
+        self.stack.append(node)
+
+    def closeNode(self) -> None:
+        self.stack.pop()
+
+    def getAst(self) -> Node:
+        return self.root
+
+
+class StreamBuilder(TreeBuilder): # Hands out each top level item once complete, instead of keeping it under the root
+    def __init__(self) -> None:
+        super().__init__()
+        self.items: list[Node] = []
+
+    def closeNode(self) -> None:
+        node = self.stack.pop()
+
+        if len(self.stack) == 1:
+            self.root.children = ()
+            self.items.append(node)
+
+
+class TableParser: # Iterative table-driven LL(1) parser. Builds the same AST as Parser
+    def __init__(self, tokenStream: list | TokenBuffer, flat: bool = False, stream: bool = False) -> None:
+        # flat stores the AST in a FlatAst, getAst then returns a cursor that reads like a Node. stream parses nothing
+        # up front, iterItems then parses while giving out the top level items one by one
+        self.tokens = tokenStream if isinstance(tokenStream, TokenBuffer) else TokenBuffer(tokenStream)
+        self.builder = StreamBuilder() if stream else FlatAst() if flat else TreeBuilder()
+        self.ast = None
+
+        if not stream:
+            self.parse()
+
+    def getAst(self) -> Node:
+        return self.ast
+
+    def getTerminal(self, token: tuple) -> str:
+        tokenLabel, tokenLexeme, offset = token
+
+        if tokenLabel != 'mnemonic':
+            return tokenLabel
+
+        if tokenLexeme not in MNEMONIC_TERMINALS:
+            raise SyntacticError('Invalid mnemonic: ' + tokenLexeme, offset)
+
+        return MNEMONIC_TERMINALS[tokenLexeme]
+
+    def parse(self) -> None:
+        for _ in self.iterItems():
+            pass
+
+    def iterItems(self): # Parse, yielding the top level items (includes and fields) a StreamBuilder completes
+        tokens = self.tokens
+        addLeaf, openNode, closeNode = self.builder.addLeaf, self.builder.openNode, self.builder.closeNode
+        items = self.builder.items if self.builder.__class__ is StreamBuilder else ()
+        stack = ['program']
+
+        token = tokens.getCurrentToken()
+        terminal = self.getTerminal(token)
+
+        while stack:
+            symbol = stack.pop()
+
+            if symbol == CLOSE:
+                closeNode()
+
+                if items:
+                    yield items.pop()
+
+                continue
+
+            if symbol.__class__ is str and symbol in PARSE_TABLE: # Nonterminal: expand it with the table
+                if (alternative := PARSE_TABLE[symbol].get(terminal)) is None:
+                    raise SyntacticError('Expected ' + ' or '.join(sorted(PARSE_TABLE[symbol])) + '. Got "' + terminal + '"', token[2])
+
+                stack.extend(alternative)
+                continue
+
+            expected = symbol if symbol.__class__ is str else symbol.terminal
+
+            if terminal != expected:
+                raise SyntacticError('Expected ' + expected + '. Got "' + terminal + '"', token[2])
+
+            if symbol.__class__ is Leaf:
+                addLeaf(symbol.kind, token[1], token[2])
+
+            elif symbol.__class__ is Open:
+                openNode(symbol.kind, token[1] if symbol.keepLexeme else '\0', token[2])
+
+            if terminal == 'EOF':
+                break
+
+            tokens.advance()
+            token = tokens.getCurrentToken()
+            terminal = self.getTerminal(token)
+
+        self.ast = self.builder.getAst()
@@ -1,332 +1,170 @@
-from utils import INSTRUCTIONS, SemanticError, Byte
+from utils import NODE_TYPES, NODE_KINDS, SourceError, SemanticError, ObjectCode
+import os
 from asm_parser import Node
+from asm_encoder import OPCODES, encodeInst
 
-class Visitor:
-    def __init__(self, root: Node) -> None:       
-        self.code = self.visit(root)
 
-        labelTable = {}
+INST_NODE_TYPES = (
+    'N Type Inst', 'R Type Inst', 'I Type Inst', 'S Type Inst', 'J Type Inst',
+    'E1 Type Inst', 'E2 Type Inst', 'E3 Type Inst', 'E4 Type Inst'
+)
 
-    def visit(self, node: Node):
-        match node.type:
-            case "Program":
-                return self.program(node)
-            case 'Include':
-                return self.include(node)
-            case "Data Field":
-                return self.dataField(node)
-            case "Space":
-                return self.space(node)
-            case "Word":
-                return self.word(node)
-            case 'Byte':
-                return self.byte(node)
-            case "Number":
-                return self.number(node)
-            case "ASCII":
-                return self.ascii(node)
-            case "String":
-                return self.string(node)
-            case "Inst Field":
-                return self.instField(node)
-            case "R Type Inst":
-                return self.rTypeInst(node)
-            case "AC Reg":
-                return self.acReg(node)
-            case "RF Reg":
-                return self.rfReg(node)
-            case _:
-                raise Exception('SEMANTICAL ERROR - Invalid node type.' + node.type)
-
-    def getMachineCode(self) :
-        return self.code
-    
-    def program(self, node: Node) :
-        code = []
+VISIT_METHODS = { # Node type -> name of the Visitor method for it
+    'Program': 'program', 'Include': 'include', 'Data Field': 'dataField', 'Space': 'space', 'Word': 'word',
+    'Byte': 'byte', 'ASCII': 'ascii', 'Inst Field': 'instField', 'Label Dec': 'labelDec', 'Pseudo Jump': 'pseudoJump',
+    'Number': 'number', 'String': 'string', 'AC Reg': 'acReg', 'RF Reg': 'rfReg',
+    **{nodeType: 'inst' for nodeType in INST_NODE_TYPES}
+}
 
-        for child in node.children:
-            code += self.visit(child)
+# Node types allowed as children of each node that dispatches on the kind of its children, others are invalid nodes
+PROGRAM_NODE_TYPES = ('Include', 'Data Field', 'Inst Field')
+DATA_NODE_TYPES = ('Label Dec', 'Space', 'Word', 'Byte', 'ASCII')
+INST_FIELD_NODE_TYPES = ('Label Dec', 'Pseudo Jump', *INST_NODE_TYPES)
 
-        return code
-    
-    def include(self, node: Node):
-        from compiler import compile
+LABEL = NODE_KINDS['Label']
 
-        fileName = node.children[0].lexeme[1:-1]
 
-        with open(fileName, 'r') as f:
-            input = f.read()
+class Visitor:
+    def __init__(self, root: Node | None, resolveLabels: bool = True, fileName: str | None = None, includeCache = None) -> None:
+        # Without a root nothing is visited up front, iterChunks then visits top level items as they come
+        self.code = ObjectCode() # Every visit method appends its bytes here
+        self.fileName = fileName
+        self.includeCache = includeCache
+        self.visitors = self.getVisitors(VISIT_METHODS) # Node kind -> bound method
+        self.programVisitors = self.getVisitors(PROGRAM_NODE_TYPES)
+        self.dataVisitors = self.getVisitors(DATA_NODE_TYPES)
+        self.instVisitors = self.getVisitors(INST_FIELD_NODE_TYPES)
 
-        return compile(input)
+        if root is None:
+            return
 
-    def dataField(self, node: Node):
-        codeBytes: list[str] = []
+        self.visit(root)
 
-        hasLabel = False
-        tempLabel = ''
+        if resolveLabels: # Included code is resolved by the including program, after it is placed
+            self.code.patchFixups()
 
-        for child in node.children:
-            if child.type == 'Label Dec':
-                hasLabel = True
-                tempLabel = child.lexeme
+    def iterChunks(self, items): # Object code of each top level item, once visited: bytes, and zero runs as their length.
+        # Label fixups are left to getPatches
+        for item in items:
+            self.visitNodes((item,), self.programVisitors)
 
-            else:
-                match child.type:
-                    case 'Space':
-                        dataBytes = self.space(child)
-                    case 'Word':
-                        dataBytes = self.word(child)
-                    case 'Byte':
-                        dataBytes = self.byte(child)
-                    case 'ASCII':
-                        dataBytes = self.ascii(child)
-                    case _:
-                        raise Exception('SEMANTICAL ERROR - Invalid node type.' + child.type)
-
-                if hasLabel:
-                    dataBytes[0].label = tempLabel
-                    hasLabel = False
-                    tempLabel = ''
-
-                codeBytes += dataBytes
-
-        return codeBytes
-    
-    def space(self, node: Node):
-        number = node.children[0].lexeme
+            yield from self.code.flush()
 
-        codeBytes = []
+    def getVisitors(self, nodeTypes) -> list: # Node kind -> bound method for nodeTypes, invalidNode for the rest
+        return [
+            getattr(self, VISIT_METHODS[nodeType]) if nodeType in nodeTypes else self.invalidNode
+            for nodeType in NODE_TYPES
+        ]
 
-        for i in range(int(number)):
-            codeByte = Byte('00000000')
-            codeBytes.append(codeByte)
+    def visitNodes(self, nodes, visitors: list) -> None: # Visit each node with the visitors of its kind
+        try:
+            for node in nodes:
+                visitors[node.kind](node)
 
-        return codeBytes
-    
-    def word(self, node: Node):
-        codeBytes = []
+        except SourceError as e: # Errors without an offset of their own happened somewhere in this node
+            if e.offset is None:
+                e.offset = node.offset
 
-        for child in node.children:
-            number = self.number(child)
-            number = bin(number)[2:]
+            raise
 
-            if len(number) > 16:
-                raise SemanticError('Number out of bounds.')
-            
-            number = number.zfill(16) # 16 bits length for a word
+    def getPatches(self) -> list[tuple[int, int]]: # (offset of a jump word, word address to OR into it)
+        return self.code.resolveFixups()
 
-            byte1 = Byte(number[:8])
-            byte2 = Byte(number[8:])
+    def visit(self, node: Node):
+        return self.visitors[node.kind](node)
 
-            codeBytes += [byte1, byte2]
+    def invalidNode(self, node: Node):
+        raise SemanticError('Invalid node type: ' + node.type, node.offset)
 
-        return codeBytes
+    def getMachineCode(self) -> ObjectCode:
+        return self.code
     
-    def byte(self, node: Node):
-        code = []
-
-        for child in node.children:
-            number = self.number(child)
-            number = bin(number)[2:]
-
-            if len(number) > 8:
-                raise Exception('SEMANTICAL ERROR - Byte out of bounds.')
-            
-            number = number.zfill(8)
-
-            code += [Byte(number)]
-
-        return code
+    def program(self, node: Node) -> None:
+        self.visitNodes(node.children, self.programVisitors)
     
-    def number(self, node: Node) -> int:
-            return int(node.lexeme)
-        
-    def ascii(self, node: Node):
-        string = self.string(node.children[0])
-
-        code = []
-
-        for char in string:
-            asciiChar = bin(ord(char))[2:].zfill(8)
+    def include(self, node: Node) -> None:
+        if self.includeCache is None:
+            from compiler import IncludeCache
 
-            code.append(Byte(asciiChar))
+            self.includeCache = IncludeCache()
 
-        return code
-
-    def string(self, node: Node) -> str:
-        return node.lexeme[1:-1]
+        fileName = node.children[0].lexeme[1:-1]
 
-    def instField(self, node: Node):
-        codeBytes = []
+        if self.fileName is not None: # Relative to the including file, or to the working directory without one
+            fileName = os.path.join(os.path.dirname(self.fileName), fileName)
 
-        hasLabel = False
-        tempLabel = ''
+        try:
+            realPath, digest, code = self.includeCache.load(fileName)
 
-        for child in node.children:
-            if child.type == 'Label Dec':
-                hasLabel = True
-                tempLabel = child.lexeme
-            
+        except SourceError as e: # Located in the included file, or about the .include itself, like a cycle
+            if e.location is None:
+                e.offset = node.offset
             else:
-                match child.type:
-                    case 'N Type Inst':
-                        instBytes = self.nTypeInst(child)
-
-                    case 'R Type Inst':
-                        instBytes = self.rTypeInst(child)
-
-                    case 'I Type Inst':
-                        instBytes = self.iTypeInst(child)
-
-                    case 'S Type Inst':
-                        instBytes = self.sTypeInst(child)
-
-                    case 'J Type Inst':
-                        instBytes = self.jTypeInst(child)
-
-                    case 'E1 Type Inst':
-                        instBytes = self.e1TypeInst(child)
-
-                    case 'E2 Type Inst':
-                        instBytes = self.e2TypeInst(child)
-
-                    case 'E3 Type Inst':
-                        instBytes = self.e3TypeInst(child)
+                e.includeOffset = node.offset
 
-                    case 'E4 Type Inst':
-                        instBytes = self.e4TypeInst(child)
+            raise
 
-                    # case 'E5 Type Inst': # todo: this will be a pseudo instruction
-                    #     instBytes = self.e5TypeInst(child)
+        except OSError as e: # Located at the .include, as errors inside the included file are
+            raise SemanticError(f'Cannot read included file ({e.strerror or e}): {fileName}', node.offset) from e
 
-                    case _:
-                        raise Exception('Dude, again, how did you get here? Please report this issue on GitHub.')
+        self.code.extendCode(code, node.offset)
+        self.code.includes[realPath] = digest
 
-                if hasLabel:
-                    instBytes[0].label = tempLabel
-                    hasLabel = False
-                    tempLabel = ''
+    def dataField(self, node: Node) -> None:
+        self.visitNodes(node.children, self.dataVisitors)
 
-                codeBytes += instBytes
+    def labelDec(self, node: Node) -> None:
+        self.code.addLabel(node.lexeme)
 
-        return codeBytes
-    
-    def nTypeInst(self, node: Node):
-        return [Byte('00000000'), Byte('00000000')]
-    
-    def rTypeInst(self, node: Node):
-        opcode = INSTRUCTIONS[node.lexeme][1] # get opcode
-
-        # get registers numbers
-        ac = self.acReg(node.children[0])
-
-        if ac == 1:
-            raise SemanticError('AC register 1 is reserved for the assembler.') # AC1 is unavailable for writing
-        
-        rf1 = self.rfReg(node.children[1])
-        rf2 = self.rfReg(node.children[2])
-        
-        # convert to binary
-        ac = bin(ac)[2:].zfill(2)
-        rf1 = bin(rf1)[2:].zfill(4)
-        rf2 = bin(rf2)[2:].zfill(4)
-
-        # concatenate to form instruction
-        inst = opcode + ac + rf1 + rf2
-
-        # split into two bytes
-        return [Byte(inst[:8]), Byte(inst[8:])]
-    
-    def iTypeInst(self, node: Node):
-        opcode = INSTRUCTIONS[node.lexeme][1]
-
-        ac = self.acReg(node.children[0])
-
-        if ac == 1:
-            raise SemanticError('AC register 1 is reserved for the assembler.')
-        
-        number = self.visit(node.children[1])
-
-        if number < 0 or number > 255:
-            raise SemanticError('Number out of bounds. Must be between 0 and 255.')
-
-        inst = opcode + bin(ac)[2:].zfill(2) + bin(number)[2:].zfill(8)
+    def space(self, node: Node) -> None:
+        number = node.children[0].lexeme
 
-        return [Byte(inst[:8]), Byte(inst[8:])]
+        self.code.reserve(int(number))
     
-    def sTypeInst(self, node: Node):
-        opcode = INSTRUCTIONS[node.lexeme][1]
-
-        ac = self.acReg(node.children[0])
-
-        if ac == 1:
-            raise SemanticError('AC register 1 is reserved for the assembler.')
-        
-        rf1 = self.rfReg(node.children[1])
-        
-        number = self.visit(node.children[2])
-
-        if number < 0 or number > 15:
-            raise SemanticError('Number out of bounds. Must be between 0 and 15.')
+    def word(self, node: Node) -> None:
+        for child in node.children:
+            number = self.number(child)
 
-        inst = opcode + bin(ac)[2:].zfill(2) + bin(rf1)[2:].zfill(4) + bin(number)[2:].zfill(4)
+            if number > 0xFFFF: # 16 bits length for a word
+                raise SemanticError('Number out of bounds.', child.offset)
 
-        return [Byte(inst[:8]), Byte(inst[8:])]
+            self.code.appendWord(number)
     
-    def jTypeInst(self, node: Node):
-        opcode = INSTRUCTIONS[node.lexeme][1]
-
-        number = self.visit(node.children[0])
-
-        if number < 0 or number > 255:
-            raise SemanticError('Number out of bounds. Must be between 0 and 1023.')
+    def byte(self, node: Node) -> None:
+        for child in node.children:
+            number = self.number(child)
 
-        inst = opcode + bin(number)[2:].zfill(10)
+            if number > 0xFF:
+                raise SemanticError('Byte out of bounds.', child.offset)
 
-        return [Byte(inst[:8]), Byte(inst[8:])]
+            self.code.append(number)
     
-    def e1TypeInst(self, node: Node):
-        opcode = INSTRUCTIONS[node.lexeme][1]
-
-        ac = self.acReg(node.children[0])
-
-        if ac == 1:
-            raise SemanticError('AC register 1 is reserved for the assembler.')
+    def number(self, node: Node) -> int:
+            return int(node.lexeme)
         
-        rf1 = self.rfReg(node.children[1])
-
-
-        inst = opcode + bin(ac)[2:].zfill(2) + bin(rf1)[2:].zfill(4) + '0000'
-
-        return [Byte(inst[:8]), Byte(inst[8:])]
-    
-    def e2TypeInst(self, node: Node):
-        opcode = INSTRUCTIONS[node.lexeme][1]
+    def ascii(self, node: Node) -> None:
+        string = self.string(node.children[0])
 
-        rf2 = self.rfReg(node.children[0])
+        self.code.extend(string.encode('ascii'))
 
-        inst = opcode + '000000' + bin(rf2)[2:].zfill(4)
+    def string(self, node: Node) -> str:
+        return node.lexeme[1:-1]
 
-        return [Byte(inst[:8]), Byte(inst[8:])]
-    
-    def e3TypeInst(self, node: Node):
-        opcode = INSTRUCTIONS[node.lexeme][1]
+    def instField(self, node: Node) -> None:
+        self.visitNodes(node.children, self.instVisitors)
 
-        ac = self.acReg(node.children[0])
+    def inst(self, node: Node) -> None: # Encode an instruction into the object code
+        self.code.appendWord(encodeInst(node))
 
-        if ac == 1:
-            raise SemanticError('AC register 1 is reserved for the assembler.')
-        
-        inst = opcode + bin(ac)[2:].zfill(2) + '0000' + '0000'
+    def pseudoJump(self, node: Node) -> None:
+        target = node.children[0]
 
-        return [Byte(inst[:8]), Byte(inst[8:])]
-    
-    def e4TypeInst(self, node: Node):
-        opcode = INSTRUCTIONS[node.lexeme][1]
-        rf1 = self.rfReg(node.children[0])
-        inst = opcode + '00' + bin(rf1)[2:].zfill(4) + '0000'
+        if target.kind == LABEL: # Jump with the address field empty, filled in by patchFixups
+            self.code.addFixup(target.lexeme, target.offset)
+            self.code.appendWord(OPCODES['jump'][0])
 
-        return [Byte(inst[:8]), Byte(inst[8:])]
+        else:
+            self.inst(node) # Same encoding as the jump instruction
     
     # def e5TypeInst(self, node: Node): # todo: this will be a pseudo instruction
     #     opcode = INSTRUCTIONS[node.lexeme][1]
@@ -345,7 +183,7 @@ class Visitor:
         acNumber = int(node.lexeme[1:])
 
         if acNumber < 0 or acNumber > 3:
-            raise SemanticError('AC register out of bounds.')
+            raise SemanticError('AC register out of bounds.', node.offset)
         
         return acNumber
         
@@ -353,6 +191,6 @@ class Visitor:
         rfNumber = int(node.lexeme[1:])
 
         if rfNumber < 0 or rfNumber > 15:
-            raise SemanticError('RF register out of bounds.')
+            raise SemanticError('RF register out of bounds.', node.offset)
         
         return rfNumber
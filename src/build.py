@@ -0,0 +1,149 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import hashlib
+import os
+
+from asm_cache import AssemblyCache
+from compiler import compile, mapSource, getIncludes, IncludeCache
+from utils import ObjectCode, SourceError, LineIndex
+
+
+# Per process state of the workers
+includeCache = None
+fused = False
+
+def initWorker(cacheDir: str | None, flatAst: bool = False, useFused: bool = False, mapped: bool = False) -> None:
+    global includeCache, fused
+
+    includeCache = IncludeCache(AssemblyCache(cacheDir) if cacheDir is not None else None, flatAst, mapped)
+    fused = useFused
+
+def assembleUnit(fileName: str, dependencies: dict[str, tuple[str, tuple]]) -> tuple:
+    # Assemble one file with its labels unresolved. dependencies maps each file it includes to (digest, packed code),
+    # already assembled by other workers. Returns ('ok', digest, packed code) or ('error', message)
+    try:
+        for include, (digest, packed) in dependencies.items():
+            includeCache.entries[(include, digest)] = ObjectCode.unpack(packed)
+
+        if includeCache.mapped: # Scanned as bytes, as includes are
+            with mapSource(fileName) as source:
+                digest = hashlib.sha256(source).hexdigest()
+                code = compile(source, False, fileName, includeCache, flatAst=includeCache.flatAst, fused=fused)
+
+        else:
+            with open(fileName, 'rb') as f:
+                source = f.read()
+
+            digest = hashlib.sha256(source).hexdigest()
+            code = compile(source.decode(), False, fileName, includeCache, flatAst=includeCache.flatAst, fused=fused)
+
+    except Exception as e:
+        return ('error', str(e))
+
+    return ('ok', digest, code.pack())
+
+
+class BuildDriver: # Assembles many files in a process pool, included files first
+    def __init__(self, fileNames: list[str], jobs: int, cacheDir: str | None = None, flatAst: bool = False,
+                 fused: bool = False, mapped: bool = False) -> None:
+        self.roots = [os.path.realpath(fileName) for fileName in fileNames]
+        self.names: dict[str, str] = {} # Root -> its name as first given, errors are located with it as in a serial build
+        self.jobs = jobs
+        self.cacheDir = cacheDir
+        self.flatAst = flatAst
+        self.fused = fused
+        self.mapped = mapped
+        self.includes: dict[str, set[str]] = {} # Include graph: file -> files it includes directly
+        self.results: dict[str, tuple] = {} # File -> result of assembleUnit
+
+        for root, fileName in zip(self.roots, fileNames):
+            self.names.setdefault(root, fileName)
+
+        self.makeGraph()
+
+    def makeGraph(self) -> None:
+        pending = list(self.roots)
+
+        while pending:
+            if (fileName := pending.pop()) in self.includes:
+                continue
+
+            self.includes[fileName] = getIncludes(fileName) or set() # Unreadable files fail when assembled
+            pending += self.includes[fileName]
+
+    def getName(self, fileName: str) -> str: # Name to assemble a file under: as given for roots, canonical for includes
+        return self.names.get(fileName, fileName)
+
+    def getDependencies(self, fileName: str) -> dict[str, tuple[str, tuple]]: # Includes assembled without errors
+        # Failed or unfinished includes are left out: the worker assembles them again, so their error reaches the
+        # includer with its location and include chain, or is found to be a cycle, as in a serial build
+        return {
+            include: result[1:] for include in self.includes[fileName]
+            if (result := self.results.get(include)) is not None and result[0] == 'ok'
+        }
+
+    def build(self) -> dict[str, ObjectCode | str]: # Input file -> resolved object code, or error message
+        includers: dict[str, set[str]] = {fileName: set() for fileName in self.includes}
+        waiting = {fileName: set(includes) for fileName, includes in self.includes.items()}
+
+        for fileName, includes in self.includes.items():
+            for include in includes:
+                includers[include].add(fileName)
+
+        ready = [fileName for fileName, includes in waiting.items() if not includes]
+        running = {}
+
+        initargs = (self.cacheDir, self.flatAst, self.fused, self.mapped)
+
+        with ProcessPoolExecutor(self.jobs, initializer=initWorker, initargs=initargs) as executor:
+            while ready or running:
+                while ready:
+                    fileName = ready.pop()
+                    running[executor.submit(assembleUnit, self.getName(fileName), self.getDependencies(fileName))] = fileName
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    self.finish(running.pop(future), future.result(), includers, waiting, ready)
+
+            # Roots that never became ready include a cycle, or are part of one. Assembled as they are, they report it
+            stuck = {
+                executor.submit(assembleUnit, self.getName(root), self.getDependencies(root)): root
+                for root in set(self.roots) if root not in self.results
+            }
+
+            for future, root in stuck.items():
+                self.results[root] = future.result()
+
+        return {root: self.getRootResult(root) for root in self.roots}
+
+    def finish(self, fileName: str, result: tuple, includers: dict, waiting: dict, ready: list) -> None:
+        self.results[fileName] = result
+
+        for includer in includers[fileName]:
+            waiting[includer].discard(fileName)
+
+            if not waiting[includer]:
+                ready.append(includer)
+
+    def getRootResult(self, fileName: str) -> ObjectCode | str:
+        if (result := self.results[fileName])[0] == 'error':
+            return result[1]
+
+        code = ObjectCode.unpack(result[2])
+
+        try:
+            code.patchFixups()
+
+        except SourceError as e: # Located here, the workers left the labels of roots unresolved
+            try:
+                with open(fileName, 'rb') as f:
+                    e.locate(self.getName(fileName), LineIndex(f.read().decode()))
+            except (OSError, ValueError): # Changed since it was assembled
+                pass
+
+            return str(e)
+
+        except Exception as e:
+            return str(e)
+
+        return code
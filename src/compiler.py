@@ -1,10 +1,320 @@
-from asm_scanner import Scanner
-from asm_parser import Parser
+from contextlib import closing, contextmanager, nullcontext
+import hashlib
+import mmap
+import os
+import re
+import time
+import tracemalloc
+
+from asm_scanner import Scanner, TokenBuffer
+from asm_table_parser import TableParser
 from asm_visitor import Visitor
+from asm_fused import assembleFused
+from asm_cache import AssemblyCache
+from utils import Node, ObjectCode, SourceError, SemanticError, LineIndex
+
+
+# .include directive followed by its string, skipping comments. Matched comments give an empty group
+INCLUDE_PATTERN = re.compile(r'#[^\n]*|(?:^|(?<=[ \n\t,:()]))\.include(?:[ \n\t]|#[^\n]*)+("[^" \n\t,:()#]*")')
+
+NOT_MEASURED = nullcontext() # Stands in for the phase timers of CompileStats when compile isn't measured
+
+
+@contextmanager
+def mapSource(fileName: str): # Read-only memory map of a source file, scanned as bytes without decoding it all
+    with open(fileName, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: # Empty files can't be mapped
+            yield b''
+            return
+
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        yield mapped
+    finally:
+        mapped.close() # Scanners over it close their token generators first, those hold the buffer
+
+
+@contextmanager
+def openSource(fileName: str, mapped: bool = False): # Source text, or a memory map of its bytes when mapped
+    if mapped:
+        with mapSource(fileName) as source:
+            yield source
+
+    else:
+        with open(fileName, 'r') as f:
+            yield f.read()
+
+@contextmanager
+def locating(input, fileName: str | None): # Give errors raised inside the file, line and column of their offset in input
+    try:
+        yield
+
+    except SourceError as e:
+        e.locate(fileName, LineIndex(input))
+        raise
+
+
+class IncludeCache: # Per run cache of assembled include files, keyed by canonical path and content hash
+    def __init__(self, diskCache: AssemblyCache | None = None, flatAst: bool = False, mapped: bool = False) -> None:
+        # diskCache persists results between runs. flatAst parses the included files into a FlatAst, as compile does.
+        # mapped scans them memory-mapped, as --mmap does
+        self.diskCache = diskCache
+        self.flatAst = flatAst
+        self.mapped = mapped
+        self.entries: dict[tuple[str, str], ObjectCode] = {}
+        self.active: list[str] = [] # Files being assembled, outermost first, to detect cyclic includes
+        self.hits = 0
+        self.misses = 0
+        self.loadTime = 0.0 # Seconds spent in the outermost load calls: reading, hashing and assembling includes
+        self.loadDepth = 0
+
+    @contextmanager
+    def including(self, fileName: str | None):
+        if fileName is None:
+            yield
+            return
+
+        realPath = os.path.realpath(fileName)
+
+        if realPath in self.active:
+            cycle = self.active[self.active.index(realPath):] + [realPath]
+            raise SemanticError('Cyclic include: ' + ' -> '.join(cycle))
+
+        self.active.append(realPath)
+
+        try:
+            yield
+        finally:
+            self.active.pop()
+
+    def invalidate(self, realPaths: set[str]) -> None: # Forget the entries of these files
+        self.entries = {key: code for key, code in self.entries.items() if key[0] not in realPaths}
+
+    def load(self, fileName: str) -> tuple[str, str, ObjectCode]: # Assemble an included file once, labels unresolved
+        start = time.perf_counter()
+        self.loadDepth += 1
+
+        try:
+            return self.loadFile(fileName)
+
+        finally:
+            if (depth := self.loadDepth) == 1: # Nested loads are part of the time of the outer one
+                self.loadTime += time.perf_counter() - start
+
+            self.loadDepth = depth - 1
+
+    def loadFile(self, fileName: str) -> tuple[str, str, ObjectCode]:
+        realPath = os.path.realpath(fileName)
+
+        if self.mapped:
+            with mapSource(realPath) as source:
+                return self.getCode(realPath, source, source)
+
+        with open(realPath, 'rb') as f:
+            source = f.read()
+
+        return self.getCode(realPath, source, source.decode())
+
+    def getCode(self, realPath: str, source: bytes, input: str | bytes) -> tuple[str, str, ObjectCode]:
+        # Cached or assembled code of the file read as source, compiled from input: its text, or source itself
+        digest = hashlib.sha256(source).hexdigest()
+        key = (realPath, digest)
+
+        if key in self.entries:
+            self.hits += 1
+            return realPath, digest, self.entries[key]
+
+        self.misses += 1
+        code = compile(input, False, realPath, self, flatAst=self.flatAst)
+        self.entries[key] = code
+
+        return realPath, digest, code
+
+
+class CompileStats: # Filled in by compile. Phase times and counts are of the file itself, includes are timed as a whole
+    def __init__(self, traceMemory: bool = False) -> None: # traceMemory records the peak with tracemalloc, slowly
+        self.traceMemory = traceMemory
+        # Phase -> seconds: 'cache', 'fused', 'scanner', 'parser', 'visitor', 'includes', 'labels'
+        self.phases: dict[str, float] = {}
+        self.tokens = 0
+        self.nodes = 0
+        self.bytes = 0
+        self.cacheHit = False # Found in the assembly cache, nothing was scanned, parsed or visited
+        self.includeHits = 0
+        self.includeMisses = 0
+        self.peakMemory: int | None = None # Bytes
+
+    def __str__(self) -> str:
+        lines = [f'{phase:>8}: {seconds * 1000:.2f} ms' for phase, seconds in self.phases.items()]
+        lines.append(f'   total: {sum(self.phases.values()) * 1000:.2f} ms')
+        lines.append(f'{self.tokens} tokens, {self.nodes} nodes, {self.bytes} bytes' + (' (cached)' if self.cacheHit else ''))
+        lines.append(f'include cache: {self.includeHits} hits, {self.includeMisses} misses')
+
+        if self.peakMemory is not None:
+            lines.append(f'peak traced memory: {self.peakMemory / 1024:.1f} KiB')
+
+        return '\n'.join(lines)
+
+    @contextmanager
+    def timing(self, phase: str): # Add the time spent inside to phase
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.phases[phase] = self.phases.get(phase, 0.0) + time.perf_counter() - start
+
+    def timeTokens(self, tokens): # Count the tokens of a lazy scan and time the scanner, which runs inside the parser
+        # Updated at every token, the parser stops at the EOF token without exhausting the generator
+        tokens = iter(tokens)
+        clock = time.perf_counter
+        phases = self.phases
+        phases.setdefault('scanner', 0.0)
+
+        while True:
+            start = clock()
+            token = next(tokens, None)
+            phases['scanner'] += clock() - start
+
+            if token is None:
+                return
+
+            self.tokens += 1
+            yield token
+
+    @contextmanager
+    def measuring(self, includeCache: IncludeCache): # Around a whole compile call: include counts and traced memory
+        startedTracing = self.traceMemory and not tracemalloc.is_tracing()
+
+        if startedTracing:
+            tracemalloc.start()
+
+        if self.traceMemory:
+            tracemalloc.reset_peak()
+
+        hits, misses, loadTime = includeCache.hits, includeCache.misses, includeCache.loadTime
+
+        try:
+            yield
+
+        finally:
+            phases = self.phases
+
+            if 'parser' in phases: # The scanner ran while parsing, and includes were assembled while visiting
+                phases['parser'] -= phases.get('scanner', 0.0)
+
+            if 'visitor' in phases:
+                phases['includes'] = includeCache.loadTime - loadTime
+                phases['visitor'] -= phases['includes']
+
+            self.includeHits = includeCache.hits - hits
+            self.includeMisses = includeCache.misses - misses
+
+            if self.traceMemory:
+                self.peakMemory = tracemalloc.get_traced_memory()[1]
+
+            if startedTracing:
+                tracemalloc.stop()
+
+
+class CodeStream: # Object code of a source one top level item at a time, for writers that start before the end
+    def __init__(self, input: str | bytes, fileName: str | None = None, includeCache: IncludeCache | None = None) -> None:
+        self.input = input
+        self.fileName = fileName
+        self.includeCache = includeCache if includeCache is not None else IncludeCache()
+        self.tokens = Scanner(input, lazy=True).iterTokens()
+        self.parser = TableParser(TokenBuffer(self.tokens), stream=True)
+        self.visitor = Visitor(None, False, fileName, self.includeCache)
+
+    def __iter__(self): # Chunks of bytes, or lengths of zero runs. Only the item being assembled and the labels are kept
+        # The token generator is closed even when an error stops it, so a memory map it scans can be closed
+        with locating(self.input, self.fileName), self.includeCache.including(self.fileName), closing(self.tokens):
+            yield from self.visitor.iterChunks(self.parser.iterItems())
+
+    def getPatches(self) -> list[tuple[int, int]]: # Label fixups to apply to the written bytes, once iterated
+        with locating(self.input, self.fileName):
+            return self.visitor.getPatches()
+
+
+def countNodes(root: Node) -> int:
+    count = 0
+    pending = [root]
+
+    while pending:
+        node = pending.pop()
+        count += 1
+        pending += node.children
+
+    return count
+
+def getIncludes(fileName: str) -> set[str] | None: # Canonical paths of the files included by fileName, None if unreadable
+    # Only looks for .include directives, without assembling, so it is cheap enough to build include graphs with
+    try:
+        with open(fileName, 'r') as f:
+            input = f.read()
+
+    except OSError:
+        return None
+
+    directory = os.path.dirname(fileName)
+
+    return {
+        os.path.realpath(os.path.join(directory, match[1:-1]))
+        for match in INCLUDE_PATTERN.findall(input) if match
+    }
+
+def compile(input: str | bytes, resolveLabels: bool = True, fileName: str | None = None,
+            includeCache: IncludeCache | None = None, stats: CompileStats | None = None,
+            flatAst: bool = False, fused: bool = False) -> ObjectCode:
+    # input is the source text, or its bytes, possibly memory-mapped. fileName is used to resolve relative includes.
+    # stats, if given, is filled in with the measurements of this call.
+    # flatAst parses into a FlatAst, a fraction of the memory of Node objects for huge sources but slower to visit.
+    # fused first tries the single pass assembler, falling back to the pipeline for sources it doesn't handle
+    if includeCache is None:
+        includeCache = IncludeCache(flatAst=flatAst)
+
+    timing = stats.timing if stats is not None else lambda phase: NOT_MEASURED
+    code = None
+
+    with stats.measuring(includeCache) if stats is not None else NOT_MEASURED:
+        if (diskCache := includeCache.diskCache) is not None:
+            with timing('cache'):
+                key = diskCache.getKey(input, fileName)
+                code = diskCache.get(key) # Warm build: skip scanning, parsing and visiting
+
+            if stats is not None:
+                stats.cacheHit = code is not None
+
+        if code is None:
+            if fused:
+                with timing('fused'):
+                    code = assembleFused(input)
+
+            if code is None:
+                # The token generator is closed even when an error stops the parser, so a memory map it scans can
+                # be closed
+                with locating(input, fileName), closing(Scanner(input, lazy=True).iterTokens()) as tokens:
+                    with timing('parser'):
+                        parser = TableParser(TokenBuffer(stats.timeTokens(tokens) if stats is not None else tokens), flatAst)
+
+                    with includeCache.including(fileName), timing('visitor'):
+                        visitor = Visitor(parser.getAst(), False, fileName, includeCache)
+
+                code = visitor.getMachineCode()
+
+                if stats is not None:
+                    stats.nodes = countNodes(parser.getAst())
+
+            if diskCache is not None: # Stored with labels unresolved, so included code can still be moved
+                with timing('cache'):
+                    diskCache.put(key, code)
+
+        if resolveLabels:
+            with locating(input, fileName), timing('labels'):
+                code.patchFixups()
 
-def compile(input: str) -> str:
-    tokenizer = Scanner(input)
-    parser = Parser(tokenizer.getTokenStream())
-    visitor = Visitor(parser.getAst())
+    if stats is not None:
+        stats.bytes = len(code)
 
-    return visitor.getMachineCode()
+    return code
@@ -0,0 +1,123 @@
+import argparse
+from array import array
+from itertools import groupby
+import os
+import sys
+import tempfile
+
+from utils import VERSION, INSTRUCTIONS, getTablesChecksum
+from asm_encoder import FIELD_LAYOUTS
+from loader import toWords
+
+
+OPERAND_PREFIXES = {'acReg': '&', 'rfReg': '$', 'number': ''}
+
+
+def getWordLine(word: int, opcodes: dict) -> str: # Assembly of a word, or a .word directive if it doesn't reassemble to it
+    if (entry := opcodes.get(word >> 10)) is None:
+        return f'.word {word}'
+
+    mnemonic, layout = entry
+    operands = []
+    encoded = word & 0xFC00
+
+    for kind, shift, maximum in layout:
+        value = (word >> shift) & maximum
+
+        if kind == 'acReg' and value == 1: # Reserved for the assembler, it can't be written in assembly
+            return f'.word {word}'
+
+        operands.append(OPERAND_PREFIXES[kind] + str(value))
+        encoded |= value << shift
+
+    if encoded != word: # Bits outside the fields of the type are set
+        return f'.word {word}'
+
+    return mnemonic + (' ' + ', '.join(operands) if operands else '')
+
+def makeTable() -> list[str]: # Line of every 16 bit word
+    opcodes = {
+        int(opcode, 2): (mnemonic, FIELD_LAYOUTS[instType])
+        for mnemonic, (instType, opcode) in INSTRUCTIONS.items()
+    }
+
+    return [getWordLine(word, opcodes) for word in range(0x10000)]
+
+
+class Disassembler: # Turns object code back into assembly through a table of all 65536 words
+    def __init__(self, cacheDir: str | None = None) -> None: # The table is kept in cacheDir between runs
+        self.lines = self.loadTable(cacheDir) if cacheDir is not None else makeTable()
+        self.isInst = bytes(line[0] != '.' for line in self.lines) # Word -> 1 if it is an instruction
+
+    def loadTable(self, cacheDir: str) -> list[str]:
+        path = os.path.join(cacheDir, f'disassembly-{VERSION}-{getTablesChecksum()}.txt')
+
+        try:
+            with open(path, 'r') as file:
+                if len(lines := file.read().split('\n')) == 0x10000:
+                    return lines
+
+        except OSError:
+            pass
+
+        lines = makeTable()
+
+        os.makedirs(cacheDir, exist_ok=True)
+
+        # Written to a temporary file of its own and renamed, readers never see a partial table and processes
+        # building it at the same time don't write into each other's
+        fd, tempPath = tempfile.mkstemp(suffix='.tmp', dir=cacheDir)
+
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.write('\n'.join(lines))
+
+            os.replace(tempPath, path)
+
+        except BaseException:
+            os.remove(tempPath)
+            raise
+
+        return lines
+
+    def disassembleWord(self, word: int) -> str:
+        return self.lines[word]
+
+    def disassemble(self, code) -> str: # Assembly source that assembles back to code
+        words = array('H', toWords(code)[:len(code) & ~1])
+
+        if sys.byteorder == 'little': # Object code is most significant byte first
+            words.byteswap()
+
+        lines = zip(map(self.isInst.__getitem__, words), map(self.lines.__getitem__, words))
+        output = []
+
+        for isInst, group in groupby(lines, lambda line: line[0]): # Runs of instructions and of data words
+            output.append('.inst' if isInst else '.data')
+            output.extend('    ' + line for _, line in group)
+
+        if len(code) % 2:
+            output += ['.data', f'    .byte {code[-1]}']
+
+        return '\n'.join(output) + '\n'
+
+
+def main() -> None:
+    argParser = argparse.ArgumentParser(description='Disassemble a MOOn-IV binary image.')
+    argParser.add_argument('file', help='raw binary image')
+    argParser.add_argument('-o', '--output', help='output file (default: standard output)')
+    argParser.add_argument('--cache-dir', help='directory to keep the decode table in')
+    args = argParser.parse_args()
+
+    with open(args.file, 'rb') as f:
+        source = Disassembler(args.cache_dir).disassemble(f.read())
+
+    if args.output is None:
+        sys.stdout.write(source)
+
+    else:
+        with open(args.output, 'w') as f:
+            f.write(source)
+
+
+if __name__ == '__main__': main()
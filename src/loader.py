@@ -1,7 +1,195 @@
-def byteToHex(byte: str) -> str:
-    return hex(int(byte, 2))[2:]
+import os
 
-def loader(machineCode: str) -> None:
-    with open('program.txt') as file:
-        for line in machineCode.split('\n'):
-            file.write(byteToHex(line[:8]) + '\n' + byteToHex(line[8:]) + '\n')
+from utils import ObjectCode
+
+
+IMAGE_WORDS = 1024 # MOOn-IV memory size in 16 bit words
+
+HEX_TO_BITS = str.maketrans({format(digit, 'x'): format(digit, '04b') for digit in range(16)})
+
+
+def getOutputPath(fileName: str, outputDir: str | None, extension: str) -> str: # Same name, next to it or in outputDir
+    outputName = os.path.splitext(os.path.basename(fileName))[0] + extension
+
+    return os.path.join(outputDir if outputDir is not None else os.path.dirname(fileName), outputName)
+
+def getOutputPaths(fileNames: list[str], outputDir: str | None, extension: str) -> dict[str, str]:
+    # Canonical path of each source -> its output file. Raises ValueError if different sources would be written to
+    # the same file, like a/x.s and b/x.s with an outputDir
+    outputPaths = {}
+    sources = {} # Canonical output path -> source writing it
+
+    for fileName in fileNames:
+        outputPath = getOutputPath(fileName, outputDir, extension)
+        realPath = os.path.realpath(fileName)
+
+        if sources.setdefault(os.path.realpath(outputPath), realPath) != realPath:
+            raise ValueError(f'{fileName} and {sources[os.path.realpath(outputPath)]} would both be written to {outputPath}')
+
+        outputPaths[realPath] = outputPath
+
+    return outputPaths
+
+def getImage(code) -> bytes: # Bytes of a buffer or an ObjectCode, its zero extents filled in
+    return bytes(code.code) if isinstance(code, ObjectCode) else bytes(code)
+
+def toWords(code) -> bytes: # Pad an odd length buffer with a zero byte so it splits into whole words
+    return getImage(code) + b'\0' if len(code) % 2 else getImage(code)
+
+def getPadding(code) -> int: # Words missing to fill the memory image
+    return max(IMAGE_WORDS - (len(code) + 1) // 2, 0)
+
+def getPieces(code) -> list[bytes | int]: # Bytes of a buffer or an ObjectCode, zero extents as their length
+    if isinstance(code, ObjectCode):
+        return code.getPieces()
+
+    return [bytes(code)] if code else []
+
+def getWordPieces(code) -> list[bytes | int]: # getPieces split into whole words, zero runs as their number of words.
+    # An odd length image gets a zero byte to complete its last word, as toWords
+    pieces = []
+    carry = b'' # Byte of a word started at the end of the previous piece
+
+    for piece in getPieces(code):
+        if piece.__class__ is int:
+            if carry: # The run completes that word
+                pieces.append(carry + b'\0')
+                carry = b''
+                piece -= 1
+
+            if piece >= 2:
+                pieces.append(piece // 2)
+
+            carry = b'\0' if piece % 2 else b''
+
+        else:
+            piece = carry + piece
+            end = len(piece) & ~1
+
+            if end:
+                pieces.append(piece[:end])
+
+            carry = piece[end:]
+
+    if carry:
+        pieces.append(carry + b'\0')
+
+    return pieces
+
+def writeRepeated(file, text: str, count: int, blockSize: int = 4096) -> None: # text count times, a block at a time
+    block = text * blockSize
+
+    for _ in range(count // blockSize):
+        file.write(block)
+
+    file.write(text * (count % blockSize))
+
+def writePieces(file, pieces) -> None: # Bytes, and zero runs given as their length, skipped over as a hole in the file
+    for piece in pieces:
+        if piece.__class__ is int:
+            file.seek(piece, os.SEEK_CUR)
+        else:
+            file.write(piece)
+
+    file.truncate() # Extends the file with zeros when it ends with a skipped run
+
+def writeBinary(code, fileName: str) -> None: # Raw bytes, most significant byte of each word first
+    with open(fileName, 'wb') as file:
+        writePieces(file, getPieces(code))
+
+def writeBinaryStream(stream, fileName: str) -> None: # Write the chunks of a CodeStream as they come, then patch labels
+    try:
+        with open(fileName, 'w+b') as file:
+            writePieces(file, stream)
+
+            for offset, address in stream.getPatches(): # The jump words were written with an empty address field
+                file.seek(offset)
+                word = int.from_bytes(file.read(2), 'big') | address
+                file.seek(offset)
+                file.write(word.to_bytes(2, 'big'))
+
+    except Exception:
+        if os.path.exists(fileName): # Don't leave a partial image behind
+            os.remove(fileName)
+
+        raise
+
+def writeWordLines(code, fileName: str, pad: bool, bits: bool) -> None: # One word per line, in hexadecimal or binary
+    # Written a piece at a time, zero extents never become a whole image in memory
+    zeroLine = '0' * (16 if bits else 4) + '\n'
+
+    with open(fileName, 'w') as file:
+        for piece in getWordPieces(code):
+            if piece.__class__ is int:
+                writeRepeated(file, zeroLine, piece)
+            else:
+                text = piece.hex('\n', -2) + '\n'
+                file.write(text.translate(HEX_TO_BITS) if bits else text)
+
+        if pad:
+            writeRepeated(file, zeroLine, getPadding(code))
+
+def writeHexText(code, fileName: str, pad: bool = True) -> None: # One word per line in hexadecimal
+    writeWordLines(code, fileName, pad, False)
+
+def writeBinText(code, fileName: str, pad: bool = True) -> None: # One word per line in binary
+    writeWordLines(code, fileName, pad, True)
+
+def writeLogisim(code, fileName: str) -> None: # Logisim ROM image with 16 bit data, 8 words per line
+    # Zero runs and the padding are run-length encoded, Logisim expands them when loading
+    with open(fileName, 'w') as file:
+        file.write('v2.0 raw\n')
+
+        for piece in getWordPieces(code):
+            if piece.__class__ is int:
+                file.write(f'{piece}*0\n')
+                continue
+
+            words = piece.hex(' ', -2).split(' ')
+
+            for index in range(0, len(words), 8):
+                file.write(' '.join(words[index:index + 8]) + '\n')
+
+        if padding := getPadding(code):
+            file.write(f'{padding}*0\n')
+
+def getHexRecord(recordType: int, address: int, data: bytes) -> str: # Intel HEX record line, address is its low 16 bits
+    record = bytes((len(data), address >> 8 & 0xFF, address & 0xFF, recordType)) + data
+
+    return ':' + record.hex().upper() + format(-sum(record) & 0xFF, '02X') + '\n'
+
+def writeIntelHex(code, fileName: str, recordSize: int = 16) -> None:
+    # Intel HEX data records and an end of file record. Zero extents are written as data records too, made a record at
+    # a time: loaders fill addresses without a record with 0xFF. An extended linear address record gives the upper
+    # 16 bits of the addresses that follow whenever they change, data records never cross a 64 KiB boundary
+    zeros = bytes(recordSize)
+    address = 0
+    upper = 0
+
+    with open(fileName, 'w') as file:
+        for piece in getPieces(code):
+            start = address
+            end = start + (piece if piece.__class__ is int else len(piece))
+
+            while address < end:
+                if address >> 16 != upper:
+                    upper = address >> 16
+                    file.write(getHexRecord(4, 0, upper.to_bytes(2, 'big')))
+
+                recordEnd = min(address + recordSize, end, (address | 0xFFFF) + 1)
+
+                if piece.__class__ is int:
+                    data = zeros[:recordEnd - address]
+                else:
+                    data = piece[address - start:recordEnd - start]
+
+                file.write(getHexRecord(0, address, data))
+                address = recordEnd
+
+        file.write(':00000001FF\n')
+
+def loader(machineCode: str) -> None: # Write 16 bit binary lines to program.txt, one hexadecimal byte per line
+    code = bytes(int(line[index:index + 8], 2) for line in machineCode.splitlines() if line for index in (0, 8))
+
+    with open('program.txt', 'w') as file:
+        file.write(code.hex('\n') + '\n' if code else '')
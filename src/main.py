@@ -1,40 +1,254 @@
+import argparse
+import os
+import sys
+
 from asm_scanner import Scanner
-from asm_parser import Parser, Node
-from asm_visitor import Visitor
+from asm_parser import Node
+from asm_table_parser import TableParser
+from asm_cache import AssemblyCache
+from compiler import compile, openSource, locating, IncludeCache, CompileStats, CodeStream
+from utils import ObjectCode
+from loader import getOutputPaths, writeBinary, writeBinaryStream, writeIntelHex, writeLogisim, writeHexText, writeBinText
+
+
+OUTPUT_FORMATS = { # Format -> (extension, writer)
+    'bin': ('.bin', writeBinary),
+    'ihex': ('.ihex', writeIntelHex),
+    'logisim': ('.img', writeLogisim),
+    'hex': ('.hex', writeHexText),
+    'bits': ('.txt', writeBinText),
+}
+
 
-def printAST(ast: Node, tab = 0):
+def printAST(ast: Node, tab = 0): # ast is a Node or a FlatNode cursor
     print('\t' * tab + '-' + ast.type)
 
     for child in ast.children:
         printAST(child, tab + 1)
 
-def main() -> None:
-    with open('../test/example.s', 'r') as f:
+def getInputFiles(args) -> list[str]:
+    fileNames = list(args.files)
+
+    if args.manifest is not None: # One path per line, relative to the manifest. Blank lines and # comments are skipped
+        manifestDir = os.path.dirname(args.manifest)
+
+        with open(args.manifest, 'r') as f:
+            for line in f.read().splitlines():
+                if (line := line.strip()) and not line.startswith('#'):
+                    fileNames.append(os.path.join(manifestDir, line))
+
+    return fileNames
+
+def showDebug(fileName: str, args) -> None: # Token stream, AST and object code of a single file
+    with open(fileName, 'r') as f:
         input = f.read()
 
-    tokenizer = Scanner(input)
-    
-    print('\nTOKEN STREAM:\n')
-    for token in tokenizer.getTokenStream():
-        print(token)
-    print('\n')
+    with locating(input, fileName):
+        tokenizer = Scanner(input)
 
-    parser = Parser(tokenizer.getTokenStream())
+        if args.tokens:
+            print('\nTOKEN STREAM:\n')
+            for token in tokenizer.getTokenStream():
+                print(token)
+            print('\n')
 
-    print('AST:\n')
-    printAST(parser.getAst())
-    print('\n')
+        parser = TableParser(tokenizer.getTokenStream(), args.flat_ast)
 
-    showMachineCode = False
+    if args.ast:
+        print('AST:\n')
+        printAST(parser.getAst())
+        print('\n')
 
-    if showMachineCode:
+    if args.code:
         print('OBJ CODE:\n')
-        visitor = Visitor(parser.getAst())
-        
-        for line in visitor.getMachineCode():
+
+        for line in compile(input, fileName=fileName, flatAst=args.flat_ast).getBytes():
             print(line)
 
         print('\n')
 
+def assembleFiles(fileNames: list[str], cacheDir: str | None, flatAst: bool = False, fused: bool = False,
+                  mapped: bool = False) -> dict[str, ObjectCode | str]: # In this process
+    includeCache = IncludeCache(AssemblyCache(cacheDir) if cacheDir is not None else None, flatAst, mapped)
+    results = {}
+
+    for fileName in fileNames:
+        try:
+            with openSource(fileName, mapped) as input:
+                results[os.path.realpath(fileName)] = compile(input, True, fileName, includeCache, flatAst=flatAst, fused=fused)
+
+        except Exception as e:
+            results[os.path.realpath(fileName)] = str(e)
+
+    return results
+
+def profileFiles(fileNames: list[str], cacheDir: str | None, mode: str, flatAst: bool = False, fused: bool = False,
+                 mapped: bool = False) -> dict[str, ObjectCode | str]:
+    # assembleFiles, printing the statistics of each file. mode 'memory' also traces memory, 'cprofile' adds a profile
+    includeCache = IncludeCache(AssemblyCache(cacheDir) if cacheDir is not None else None, flatAst, mapped)
+    results = {}
+
+    if mode == 'cprofile':
+        import cProfile
+
+        profiler = cProfile.Profile()
+
+    for fileName in fileNames:
+        stats = CompileStats(traceMemory=mode == 'memory')
+
+        try:
+            with openSource(fileName, mapped) as input:
+                if mode == 'cprofile':
+                    profiler.enable()
+
+                try:
+                    results[os.path.realpath(fileName)] = compile(input, True, fileName, includeCache, stats, flatAst, fused)
+                finally:
+                    if mode == 'cprofile':
+                        profiler.disable()
+
+        except Exception as e:
+            results[os.path.realpath(fileName)] = str(e)
+
+        print(f'{fileName}:\n{stats}\n', file=sys.stderr)
+
+    if mode == 'cprofile':
+        import pstats
+
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(30)
+
+    return results
+
+def streamFiles(fileNames: list[str], outputPaths: dict[str, str], quiet: bool, mapped: bool = False,
+                flatAst: bool = False) -> int:
+    # Binary images written while they are assembled, without holding a whole program's code, to the paths from
+    # getOutputPaths. Returns the number of files that failed. Only includes are parsed into a FlatAst with flatAst
+    includeCache = IncludeCache(flatAst=flatAst, mapped=mapped)
+    failed = 0
+
+    for fileName in fileNames:
+        outputPath = outputPaths[os.path.realpath(fileName)]
+
+        try:
+            with openSource(fileName, mapped) as input:
+                writeBinaryStream(CodeStream(input, fileName, includeCache), outputPath)
+
+        except Exception as e:
+            failed += 1
+            print(fileName + ': ' + str(e), file=sys.stderr)
+            continue
+
+        if not quiet:
+            print(fileName + ' -> ' + outputPath)
+
+    return failed
+
+def main() -> None:
+    argParser = argparse.ArgumentParser(description='SEA-IV: assembler for the MOOn-IV architecture.')
+    argParser.add_argument('files', nargs='*', help='assembly files')
+    argParser.add_argument('-m', '--manifest', help='file listing assembly files, one per line')
+    argParser.add_argument('-o', '--output-dir', help='directory for the output files (default: next to each source)')
+    argParser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='bin', help='output format')
+    argParser.add_argument('-j', '--jobs', type=int, default=1, help='number of worker processes')
+    argParser.add_argument('-q', '--quiet', action='store_true', help='only report errors')
+    argParser.add_argument('--cache-dir', help='directory of the persistent assembly cache')
+    argParser.add_argument('--watch', action='store_true', help='reassemble whenever a source or include changes')
+    argParser.add_argument('--profile', nargs='?', const='stats', choices=('stats', 'memory', 'cprofile'),
+                           help='print per phase statistics of each file, with traced memory or a cProfile report')
+    argParser.add_argument('--stream', action='store_true', help='write binary images while assembling, field by field')
+    argParser.add_argument('--fused', action='store_true', help='assemble plain sources in a single pass')
+    argParser.add_argument('--mmap', action='store_true', help='scan memory-mapped sources as bytes, without reading them in')
+    argParser.add_argument('--flat-ast', action='store_true', help='keep the AST in flat arrays, for very large sources')
+    argParser.add_argument('--tokens', action='store_true', help='print the token stream of each file')
+    argParser.add_argument('--ast', action='store_true', help='print the AST of each file')
+    argParser.add_argument('--code', action='store_true', help='print the object code of each file')
+    args = argParser.parse_args()
+
+    fileNames = getInputFiles(args)
+
+    if not fileNames:
+        argParser.error('no input files')
+
+    try: # Watch mode always writes binary images
+        outputPaths = getOutputPaths(fileNames, args.output_dir, '.bin' if args.watch else OUTPUT_FORMATS[args.format][0])
+    except ValueError as e:
+        argParser.error(str(e))
+
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.watch:
+        from watch import Watcher
+
+        try:
+            Watcher(
+                fileNames, args.output_dir, diskCache=AssemblyCache(args.cache_dir) if args.cache_dir else None,
+                flatAst=args.flat_ast, fused=args.fused, mapped=args.mmap
+            ).run()
+        except KeyboardInterrupt:
+            pass
+
+        return
+
+    if args.stream and args.format != 'bin':
+        argParser.error('--stream only writes the bin format')
+
+    if args.stream and args.fused: # The single pass assembler makes the whole object code at once
+        argParser.error('--fused can\'t be combined with --stream')
+
+    total = len(fileNames)
+    failed = 0
+
+    if args.tokens or args.ast or args.code:
+        for fileName in list(fileNames):
+            try:
+                showDebug(fileName, args)
+
+            except Exception as e: # Assembling it would fail the same way, it is reported once
+                failed += 1
+                print(fileName + ': ' + str(e), file=sys.stderr)
+                fileNames.remove(fileName)
+
+    if args.stream:
+        failed += streamFiles(fileNames, outputPaths, args.quiet, args.mmap, args.flat_ast)
+
+        if not args.quiet:
+            print(f'{total - failed} assembled, {failed} failed')
+
+        sys.exit(1 if failed else 0)
+
+    if args.profile is not None: # In this process, whatever --jobs says
+        results = profileFiles(fileNames, args.cache_dir, args.profile, args.flat_ast, args.fused, args.mmap)
+    elif args.jobs > 1:
+        from build import BuildDriver # Imported here, the process pool machinery is slow to import
+
+        results = BuildDriver(fileNames, args.jobs, args.cache_dir, args.flat_ast, args.fused, args.mmap).build()
+    else:
+        results = assembleFiles(fileNames, args.cache_dir, args.flat_ast, args.fused, args.mmap)
+
+    for fileName in fileNames:
+        if isinstance(result := results[os.path.realpath(fileName)], str):
+            failed += 1
+            print(fileName + ': ' + result, file=sys.stderr)
+            continue
+
+        outputPath = outputPaths[os.path.realpath(fileName)]
+
+        try:
+            OUTPUT_FORMATS[args.format][1](result, outputPath)
+
+        except Exception as e:
+            failed += 1
+            print(fileName + ': ' + str(e), file=sys.stderr)
+            continue
+
+        if not args.quiet:
+            print(fileName + ' -> ' + outputPath)
+
+    if not args.quiet:
+        print(f'{total - failed} assembled, {failed} failed')
+
+    sys.exit(1 if failed else 0)
+
 
 if __name__ == '__main__': main()
@@ -0,0 +1,319 @@
+import argparse
+from array import array
+import re
+
+from utils import INSTRUCTIONS, SimulationError
+from asm_encoder import FIELD_LAYOUTS
+
+
+MEMORY_WORDS = 1024 # 16 bit words, addressed by 10 bits
+LINK_REGISTER = 15 # jal and jral save the return address in $15
+
+# Semantics of each instruction as Python source, shared by the interpreter and the block compiler. Operands are
+# a, b and c in the order of the instruction's field layout, s is the simulator and pc the address of the instruction.
+# The first string is executed, the second gives the address of the next instruction.
+NEXT = '(pc + 1) & 0x3FF'
+
+SEMANTICS = {
+    'nope': ('pass', NEXT),
+
+    'add': ('s.ac[a] = (s.rf[b] + s.rf[c]) & 0xFFFF', NEXT),
+    'sub': ('s.ac[a] = (s.rf[b] - s.rf[c]) & 0xFFFF', NEXT),
+    'not': ('s.ac[a] = ~s.rf[b] & 0xFFFF', NEXT),
+    'and': ('s.ac[a] = s.rf[b] & s.rf[c]', NEXT),
+    'or': ('s.ac[a] = s.rf[b] | s.rf[c]', NEXT),
+    'xor': ('s.ac[a] = s.rf[b] ^ s.rf[c]', NEXT),
+    'nand': ('s.ac[a] = ~(s.rf[b] & s.rf[c]) & 0xFFFF', NEXT),
+    'nor': ('s.ac[a] = ~(s.rf[b] | s.rf[c]) & 0xFFFF', NEXT),
+    'xnor': ('s.ac[a] = ~(s.rf[b] ^ s.rf[c]) & 0xFFFF', NEXT),
+    'slt': ('s.ac[a] = int((s.rf[b] ^ 0x8000) < (s.rf[c] ^ 0x8000))', NEXT), # Signed, flipping the sign bit keeps the order
+
+    'tmul': ('s.hi, s.lo = divmod(s.lo * s.rf[a], 0x10000)', NEXT),
+    'tdiv': ('s.lo, s.hi = divmod(s.lo, s.rf[a]) if s.rf[a] else s.divisionByZero(pc)', NEXT),
+
+    'sll': ('s.ac[a] = (s.rf[b] << c) & 0xFFFF', NEXT),
+    'srl': ('s.ac[a] = s.rf[b] >> c', NEXT),
+    'sra': ('s.ac[a] = (((s.rf[b] ^ 0x8000) - 0x8000) >> c) & 0xFFFF', NEXT),
+
+    'mtl': ('s.lo = s.ac[a]', NEXT),
+    'mfl': ('s.ac[a] = s.lo', NEXT),
+    'mth': ('s.hi = s.ac[a]', NEXT),
+    'mfh': ('s.ac[a] = s.hi', NEXT),
+    'mtac': ('s.ac[a] = s.rf[b]', NEXT),
+    'mfac': ('s.rf[b] = s.ac[a]', NEXT),
+
+    'addi': ('s.ac[a] = (s.ac[a] + b) & 0xFFFF', NEXT),
+    'subi': ('s.ac[a] = (s.ac[a] - b) & 0xFFFF', NEXT),
+    'andi': ('s.ac[a] = s.ac[a] & b', NEXT),
+    'ori': ('s.ac[a] = s.ac[a] | b', NEXT),
+    'xori': ('s.ac[a] = s.ac[a] ^ b', NEXT),
+    'nandi': ('s.ac[a] = ~(s.ac[a] & b) & 0xFFFF', NEXT),
+    'nori': ('s.ac[a] = ~(s.ac[a] | b) & 0xFFFF', NEXT),
+    'xnori': ('s.ac[a] = ~(s.ac[a] ^ b) & 0xFFFF', NEXT),
+    'lli': ('s.ac[a] = (s.ac[a] & 0xFF00) | b', NEXT),
+    'lui': ('s.ac[a] = (s.ac[a] & 0x00FF) | (b << 8)', NEXT),
+    'lsi': ('s.ac[a] = ((b ^ 0x80) - 0x80) & 0xFFFF', NEXT), # Sign extended
+
+    'lwr': ('s.ac[a] = s.mem[(s.rf[b] + s.rf[c]) & 0x3FF]', NEXT),
+    'swr': ('s.store((s.rf[b] + s.rf[c]) & 0x3FF, s.ac[a])', NEXT),
+    'push': ('s.sp = (s.sp - 1) & 0x3FF; s.store(s.sp, s.ac[a])', NEXT), # The stack grows down from the top of memory
+    'pop': ('s.ac[a] = s.mem[s.sp]; s.sp = (s.sp + 1) & 0x3FF', NEXT),
+
+    'jump': ('pass', 'a'),
+    'jal': (f's.rf[{LINK_REGISTER}] = (pc + 1) & 0x3FF', 'a'),
+    'jr': ('pass', 's.rf[a] & 0x3FF'),
+    'jral': (f'target = s.rf[a] & 0x3FF; s.rf[{LINK_REGISTER}] = (pc + 1) & 0x3FF', 'target'),
+
+    'bgtz': ('pass', 'b if 0 < s.ac[a] < 0x8000 else ' + NEXT),
+    'bltz': ('pass', 'b if s.ac[a] >= 0x8000 else ' + NEXT),
+    'beqz': ('pass', 'b if s.ac[a] == 0 else ' + NEXT),
+    'bnez': ('pass', 'b if s.ac[a] != 0 else ' + NEXT),
+    'bgtzr': ('pass', 's.rf[b] & 0x3FF if 0 < s.ac[a] < 0x8000 else ' + NEXT),
+    'bltzr': ('pass', 's.rf[b] & 0x3FF if s.ac[a] >= 0x8000 else ' + NEXT),
+    'beqzr': ('pass', 's.rf[b] & 0x3FF if s.ac[a] == 0 else ' + NEXT),
+    'bnezr': ('pass', 's.rf[b] & 0x3FF if s.ac[a] != 0 else ' + NEXT),
+}
+
+
+def makeHandler(name: str, body: str, nextPc: str): # Compile the semantics of an instruction into a function
+    namespace = {}
+    exec(f'def {name}(s, a, b, c, pc):\n    {body}\n    return {nextPc}\n', namespace)
+
+    return namespace[name]
+
+def invalidInst(s, a, b, c, pc):
+    raise SimulationError(f'Invalid instruction {s.mem[pc]:04x} at address {pc}')
+
+def getHandlers() -> tuple[list, dict, list]: # Handlers, opcode -> handler index, handler index -> field layout
+    handlers = [invalidInst]
+    layouts = [()]
+    opcodeHandlers = {}
+
+    for mnemonic, (instType, opcode) in INSTRUCTIONS.items():
+        if mnemonic not in SEMANTICS: # Instructions added to insts.csv without semantics are invalid here
+            continue
+
+        body, nextPc = SEMANTICS[mnemonic]
+        opcodeHandlers[int(opcode, 2)] = len(handlers)
+        handlers.append(makeHandler('inst_' + mnemonic, body, nextPc))
+        layouts.append(FIELD_LAYOUTS[instType])
+
+    return handlers, opcodeHandlers, layouts
+
+
+HANDLERS, OPCODE_HANDLERS, HANDLER_LAYOUTS = getHandlers()
+HANDLER_NAMES = [handler.__name__.removeprefix('inst_') for handler in HANDLERS]
+
+BLOCK_ENDS = {'jump', 'jal', 'jr', 'jral', 'bgtz', 'bltz', 'beqz', 'bnez', 'bgtzr', 'bltzr', 'beqzr', 'bnezr'}
+STORES = {'swr', 'push'}
+MAX_BLOCK_SIZE = 256
+
+OPERAND_PATTERN = re.compile(r'(?<![.\w])(a|b|c|pc)(?!\w)')
+STATE_PATTERN = re.compile(r's\.(ac|rf|mem)\[') # Lists bound to locals in the block function
+
+
+def decodeWord(word: int) -> tuple[int, int, int, int]: # (handler index, a, b, c)
+    handler = OPCODE_HANDLERS.get(word >> 10, 0)
+    operands = [(word >> shift) & maximum for _, shift, maximum in HANDLER_LAYOUTS[handler]]
+    operands += [0] * (3 - len(operands))
+
+    return handler, operands[0], operands[1], operands[2]
+
+
+class Simulator: # MOOn-IV instruction set simulator. The image is decoded once into handler and operand arrays
+    def __init__(self, code) -> None: # code: object code bytes, two per word, most significant first
+        if len(code) > MEMORY_WORDS * 2:
+            raise SimulationError('Image larger than memory.')
+
+        image = bytes(code) + bytes(MEMORY_WORDS * 2 - len(code))
+
+        self.mem = [(image[index] << 8) | image[index + 1] for index in range(0, len(image), 2)]
+        self.ac = [0] * 4
+        self.rf = [0] * 16
+        self.lo = 0
+        self.hi = 0
+        self.sp = 0 # First push goes to the last word of memory
+        self.pc = 0
+        self.steps = 0
+        self.halted = False
+
+        self.ops = array('B', bytes(MEMORY_WORDS))
+        self.a = array('H', bytes(MEMORY_WORDS * 2))
+        self.b = array('H', bytes(MEMORY_WORDS * 2))
+        self.c = array('H', bytes(MEMORY_WORDS * 2))
+
+        for address in range(MEMORY_WORDS):
+            self.decode(address)
+
+    def decode(self, address: int) -> None:
+        self.ops[address], self.a[address], self.b[address], self.c[address] = decodeWord(self.mem[address])
+
+    def store(self, address: int, value: int) -> None: # Memory write, decoding the word again for the dispatch arrays
+        self.mem[address] = value
+        self.decode(address)
+
+    def divisionByZero(self, pc: int):
+        raise SimulationError(f'Division by zero at address {pc}')
+
+    def run(self, maxSteps: int = 1_000_000) -> int: # Execute until halted or maxSteps. Returns the steps executed
+        # A jump or branch to itself halts: nothing can change after it
+        handlers = HANDLERS
+        ops, a, b, c = self.ops, self.a, self.b, self.c
+        pc = self.pc
+        steps = 0
+
+        while steps < maxSteps:
+            nextPc = handlers[ops[pc]](self, a[pc], b[pc], c[pc], pc)
+            steps += 1
+
+            if nextPc == pc:
+                self.halted = True
+                break
+
+            pc = nextPc
+
+        self.pc = pc
+        self.steps += steps
+
+        return steps
+
+    def step(self) -> None: # Execute one instruction, decoding it from memory (reference for the pre-decoded run)
+        handler, a, b, c = decodeWord(self.mem[self.pc])
+        nextPc = HANDLERS[handler](self, a, b, c, self.pc)
+        self.steps += 1
+
+        if nextPc == self.pc:
+            self.halted = True
+
+        self.pc = nextPc
+
+    def getState(self) -> str:
+        return (
+            f'pc={self.pc} steps={self.steps} halted={self.halted} lo={self.lo} hi={self.hi} sp={self.sp}\n'
+            f'ac={self.ac}\nrf={self.rf}'
+        )
+
+
+class BlockSimulator(Simulator): # Compiles each basic block into a Python function, cached by entry address
+    def __init__(self, code) -> None:
+        super().__init__(code)
+
+        self.blocks: dict[int, tuple] = {} # Entry address -> (function, length)
+        self.covering: dict[int, list[int]] = {} # Address -> entries of the blocks containing it
+        self.dirty = False # Set when a store invalidates a block, the running block returns after that store
+
+    def store(self, address: int, value: int) -> None:
+        super().store(address, value)
+
+        if entries := self.covering.pop(address, None):
+            for entry in entries:
+                self.blocks.pop(entry, None)
+
+            self.dirty = True
+
+    def getBlockSource(self, entry: int) -> tuple[str, int] | None: # Source of the block starting at entry, and length
+        lines = [f'def block_{entry}(s):', '    ac, rf, mem = s.ac, s.rf, s.mem']
+        pc = entry
+        length = 0
+
+        while length < MAX_BLOCK_SIZE:
+            if not (handler := self.ops[pc]): # Invalid instruction, left for the interpreter to report
+                break
+
+            name = HANDLER_NAMES[handler]
+            operands = {'a': str(self.a[pc]), 'b': str(self.b[pc]), 'c': str(self.c[pc]), 'pc': str(pc)}
+            body, nextPc = (
+                STATE_PATTERN.sub(r'\1[', OPERAND_PATTERN.sub(lambda match: operands[match[1]], part))
+                for part in SEMANTICS[name]
+            )
+
+            lines.append('    ' + body)
+            length += 1
+
+            if name in BLOCK_ENDS: # Returns the next address, the address of the last instruction and the steps
+                lines.append(f'    return {nextPc}, {pc}, {length}')
+                return '\n'.join(lines) + '\n', length
+
+            if name in STORES:
+                lines.append(f'    if s.dirty: s.dirty = False; return {nextPc}, {pc}, {length}')
+
+            if (pc := (pc + 1) & 0x3FF) == entry:
+                break
+
+        if not length:
+            return None
+
+        lines.append(f'    return {pc}, -1, {length}')
+
+        return '\n'.join(lines) + '\n', length
+
+    def compileBlock(self, entry: int) -> tuple | None:
+        if (source := self.getBlockSource(entry)) is None:
+            return None
+
+        namespace = {}
+        exec(source[0], namespace)
+
+        block = (namespace[f'block_{entry}'], source[1])
+        self.blocks[entry] = block
+
+        for offset in range(block[1]):
+            self.covering.setdefault((entry + offset) & 0x3FF, []).append(entry)
+
+        return block
+
+    def run(self, maxSteps: int = 1_000_000) -> int:
+        blocks = self.blocks
+        pc = self.pc
+        steps = 0
+
+        while steps < maxSteps:
+            block = blocks.get(pc) or self.compileBlock(pc)
+
+            if block is None or block[1] > maxSteps - steps: # Interpret a single instruction
+                last, count = pc, 1
+                nextPc = HANDLERS[self.ops[pc]](self, self.a[pc], self.b[pc], self.c[pc], pc)
+                self.dirty = False
+
+            else:
+                nextPc, last, count = block[0](self)
+
+            steps += count
+
+            if nextPc == last: # A jump or branch to itself halts
+                self.halted = True
+                pc = nextPc
+                break
+
+            pc = nextPc
+
+        self.pc = pc
+        self.steps += steps
+
+        return steps
+
+
+def main() -> None:
+    argParser = argparse.ArgumentParser(description='Run a MOOn-IV program.')
+    argParser.add_argument('file', help='assembly file (.s) or raw binary image')
+    argParser.add_argument('-n', '--max-steps', type=int, default=1_000_000, help='maximum instructions to execute')
+    argParser.add_argument('-e', '--engine', choices=('blocks', 'interpreter'), default='blocks', help='execution engine')
+    args = argParser.parse_args()
+
+    if args.file.endswith('.s'):
+        from compiler import compile
+
+        with open(args.file, 'r') as f:
+            code = compile(f.read(), fileName=args.file).code
+
+    else:
+        with open(args.file, 'rb') as f:
+            code = f.read()
+
+    simulator = (BlockSimulator if args.engine == 'blocks' else Simulator)(code)
+    simulator.run(args.max_steps)
+
+    print(simulator.getState())
+
+
+if __name__ == '__main__': main()
@@ -1,17 +1,39 @@
-import csv
+from bisect import bisect_left, bisect_right
+import os
+import re
+import zlib
 
 
-class Node: # AST Node
-    def __init__(self, type, lexeme: str = '\0') -> None:
-        self.type = type
+NODE_TYPES = ( # Node kinds are indexes into this tuple
+    'Program', 'Include', 'Data Field', 'Space', 'Word', 'Byte', 'ASCII', 'Inst Field', 'Label Dec', 'Label',
+    'Pseudo Jump', 'N Type Inst', 'R Type Inst', 'I Type Inst', 'S Type Inst', 'J Type Inst', 'E1 Type Inst',
+    'E2 Type Inst', 'E3 Type Inst', 'E4 Type Inst', 'Number', 'String', 'AC Reg', 'RF Reg'
+)
+NODE_KINDS = {nodeType: kind for kind, nodeType in enumerate(NODE_TYPES)}
+
+
+class Node: # AST Node. Leaves share an empty tuple, the children list is only made by the first addChild
+    __slots__ = ('kind', 'lexeme', 'children', 'offset')
+
+    def __init__(self, type: str | int, lexeme: str = '\0', offset: int | None = None) -> None:
+        # type is the name of the kind or the kind itself. offset is where its token starts in the source
+        self.kind: int = type if type.__class__ is int else NODE_KINDS[type]
         self.lexeme: str = lexeme
-        self.children: list[Node] = []
+        self.children: list[Node] | tuple = ()
+        self.offset = offset
+
+    @property
+    def type(self) -> str:
+        return NODE_TYPES[self.kind]
 
     def __repr__(self) -> str:
-        return f'{self.type}({self.lexeme}) -> {self.children}'
+        return f'{self.type}({self.lexeme}) -> {list(self.children)}'
 
     def addChild(self, child) -> None:
-        self.children.append(child)
+        if self.children:
+            self.children.append(child)
+        else:
+            self.children = [child]
 
 
 class Byte: # Object code byte
@@ -23,35 +45,276 @@ class Byte: # Object code byte
         return f'{self.label}: {self.byte}' if len(self.label) > 0 else self.byte
 
 
+MIN_EXTENT = 64 # Shorter zero runs are stored as bytes
+
+
+class ObjectCode: # Object code buffer. Bytes live in bytearrays, with long zero runs kept as their length only
+    def __init__(self) -> None:
+        self.data = bytearray() # Bytes after the last zero extent
+        self.parts: list[tuple[bytearray, int]] = [] # (bytes, length of the zero run after them), in front of data
+        self.partsSize = 0
+        self.labels: dict[int, list[str]] = {} # Offset -> labels declared there, in declaration order
+        self.offsets: dict[str, int] = {} # Symbol table
+        # (offset of a jump word, label it targets, source offset of the label), patched by patchFixups
+        self.fixups: list[tuple[int, str, int | None]] = []
+        self.includes: dict[str, str] = {} # Canonical path -> content hash of every file included, directly or not
+        self.base = 0 # Bytes already handed out by flush. Offsets count from the start of the program
+
+    def __len__(self) -> int:
+        return self.base + self.partsSize + len(self.data)
+
+    def __repr__(self) -> str:
+        return '\n'.join(repr(byte) for byte in self.getBytes())
+
+    @property
+    def code(self) -> bytearray: # A new bytearray of all the bytes, zero extents filled in. getPieces avoids the copy
+        if not self.parts:
+            return bytearray(self.data)
+
+        image = bytearray(self.partsSize + len(self.data)) # Zero filled in one go, then the bytes are copied over
+        offset = 0
+
+        for data, zeros in self.parts:
+            image[offset:offset + len(data)] = data
+            offset += len(data) + zeros
+
+        image[offset:] = self.data
+
+        return image
+
+    def getPieces(self) -> list[bytes | int]: # The bytes in order, zero extents as their length
+        pieces = []
+
+        for data, zeros in self.parts:
+            if data:
+                pieces.append(bytes(data))
+
+            pieces.append(zeros)
+
+        if self.data:
+            pieces.append(bytes(self.data))
+
+        return pieces
+
+    def append(self, byte: int) -> None:
+        self.data.append(byte)
+
+    def appendWord(self, word: int) -> None: # Append a 16 bit word, most significant byte first
+        self.data.append(word >> 8)
+        self.data.append(word & 0xFF)
+
+    def extend(self, data) -> None:
+        self.data += data
+
+    def reserve(self, size: int) -> None: # Append size zero bytes
+        if size < MIN_EXTENT:
+            self.data += bytes(size)
+            return
+
+        self.parts.append((self.data, size))
+        self.partsSize += len(self.data) + size
+        self.data = bytearray()
+
+    def addLabel(self, label: str) -> None: # Label the next byte to be appended
+        if label in self.offsets:
+            raise SemanticError('Label declared more than once: ' + label)
+
+        offset = len(self)
+
+        self.labels.setdefault(offset, []).append(label)
+        self.offsets[label] = offset
+
+    def addFixup(self, label: str, sourceOffset: int | None = None) -> None:
+        # The next word appended gets the address of label in its low 10 bits. sourceOffset locates errors about label
+        self.fixups.append((len(self), label, sourceOffset))
+
+    def extendCode(self, other, sourceOffset: int | None = None) -> None:
+        # Append another object code, moving its labels and fixups after the current bytes. The source offsets of its
+        # fixups are in another file, they become sourceOffset, the .include that brought them in
+        base = len(self)
+
+        for label, offset in other.offsets.items():
+            if label in self.offsets:
+                raise SemanticError('Label declared more than once: ' + label)
+
+            self.offsets[label] = base + offset
+
+        for offset, labels in other.labels.items():
+            self.labels.setdefault(base + offset, []).extend(labels)
+
+        for offset, label, _ in other.fixups:
+            self.fixups.append((base + offset, label, sourceOffset))
+
+        self.includes.update(other.includes)
+
+        for data, zeros in other.parts: # Copied, other may be a cached include used again
+            self.data += data
+            self.parts.append((self.data, zeros))
+            self.partsSize += len(self.data) + zeros
+            self.data = bytearray()
+
+        self.data += other.data
+
+    def flush(self) -> list[bytes | int]: # Hand out the pieces appended so far and drop them. Fixups in them can't be patched here
+        pieces = self.getPieces()
+        self.base = len(self)
+        self.parts = []
+        self.partsSize = 0
+        self.data = bytearray()
+
+        return pieces
+
+    def resolveFixups(self) -> list[tuple[int, int]]: # (offset of a jump word, word address for it), once all labels are known
+        offsets = self.offsets
+        addresses = []
+
+        for offset, label, sourceOffset in self.fixups:
+            if label not in offsets:
+                raise SemanticError('Undefined label: ' + label, sourceOffset)
+
+            if (target := offsets[label]) % 2 != 0:
+                raise SemanticError('Label is not word aligned: ' + label, sourceOffset)
+
+            if (address := target // 2) > 1023: # Labels resolve to word addresses
+                raise SemanticError('Label address out of bounds: ' + label, sourceOffset)
+
+            addresses.append((offset, address))
+
+        return addresses
+
+    def patchFixups(self) -> None: # Resolve every label reference in one pass, in code that was never flushed
+        starts = [] # Offset of the bytes of each part
+        offset = 0
+
+        for data, zeros in self.parts:
+            starts.append(offset)
+            offset += len(data) + zeros
+
+        for offset, address in self.resolveFixups():
+            if offset >= self.partsSize:
+                code, offset = self.data, offset - self.partsSize
+            else: # A jump word is never split by a zero extent
+                part = bisect_right(starts, offset) - 1
+                code, offset = self.parts[part][0], offset - starts[part]
+
+            code[offset] |= address >> 8
+            code[offset + 1] |= address & 0xFF
+
+        self.fixups.clear()
+
+    def pack(self) -> tuple: # Compact plain data form, cheap to pickle between processes
+        parts = [(bytes(data), zeros) for data, zeros in self.parts]
+
+        return (bytes(self.data), self.offsets, self.fixups, self.includes, parts)
+
+    @staticmethod
+    def unpack(packed: tuple):
+        code = ObjectCode()
+        codeBytes, code.offsets, code.fixups, code.includes, parts = packed
+        code.data = bytearray(codeBytes)
+        code.parts = [(bytearray(data), zeros) for data, zeros in parts]
+        code.partsSize = sum(len(data) + zeros for data, zeros in parts)
+        code.labels = {}
+
+        for label, offset in code.offsets.items(): # In declaration order, as addLabel keeps them
+            code.labels.setdefault(offset, []).append(label)
+
+        return code
+
+    def getBytes(self) -> list[Byte]: # Compatibility path: one Byte object per byte
+        codeBytes = [Byte(format(byte, '08b')) for byte in self.code]
+
+        for offset, labels in self.labels.items():
+            if offset < len(codeBytes):
+                codeBytes[offset].label = ', '.join(labels)
+
+        return codeBytes
+
+
 # Exceptions
-class LexicalError(Exception):
-    def __init__(self, message: str) -> None:
+class SourceError(Exception): # Error at an offset of a source, turned into a file, line and column by locate
+    def __init__(self, message: str, offset: int | None = None) -> None:
         self.message = message
+        self.offset = offset
+        self.location: tuple[str | None, int, int] | None = None # (file name, line, column), counted from 1
+        self.includeOffset: int | None = None # Offset of the .include that led to the error, in the including source
+        self.includedFrom: list[tuple[str | None, int, int]] = [] # Locations of the .include directives, innermost first
+
+    def locate(self, fileName: str | None, lines) -> None: # lines is the LineIndex of the source the offsets are in
+        if self.location is None:
+            if self.offset is not None:
+                self.location = (fileName, *lines.getPosition(self.offset))
+
+        elif self.includeOffset is not None:
+            self.includedFrom.append((fileName, *lines.getPosition(self.includeOffset)))
+
+        self.includeOffset = None
+
+    def getLocationText(self) -> str: # ' (file, line 3, column 5; included from ...)' or nothing if it wasn't located
+        if self.location is None:
+            return ''
+
+        locations = [
+            (fileName + ', ' if fileName is not None else '') + f'line {line}, column {column}'
+            for fileName, line, column in [self.location] + self.includedFrom
+        ]
+
+        return ' (' + '; included from '.join(locations) + ')'
 
+
+class LexicalError(SourceError):
     def __str__(self) -> str:
-        return 'Lexical Error: ' + self.message
+        return 'Lexical Error: ' + self.message + self.getLocationText()
     
 
-class SyntacticError(Exception):
-    def __init__(self, message: str) -> None:
-        self.message = message
+class SyntacticError(SourceError):
+    def __str__(self) -> str:
+        return 'Syntactic Error: ' + self.message + self.getLocationText()
+
 
+class SemanticError(SourceError):
     def __str__(self) -> str:
-        return 'Syntactic Error: ' + self.message
+        return 'Semantic Error: ' + self.message + self.getLocationText()
+
+
+class LineIndex: # Line starts of a source, found on the first lookup so sources without errors never pay for them
+    NEWLINE = re.compile('\n')
+    NEWLINE_BYTES = re.compile(b'\n')
+
+    def __init__(self, source) -> None: # source as given to the scanner: a str, or bytes for offsets counted in bytes
+        self.source = source
+        self.newlines: list[int] | None = None
+
+    def getPosition(self, offset: int) -> tuple[int, int]: # (line, column) of an offset, counted from 1
+        if self.newlines is None:
+            newline = self.NEWLINE if isinstance(self.source, str) else self.NEWLINE_BYTES
+            self.newlines = [match.start() for match in newline.finditer(self.source)]
+
+        line = bisect_left(self.newlines, offset) # Newlines before the offset
+
+        return line + 1, offset - (self.newlines[line - 1] + 1 if line else 0) + 1
 
 
-class SemanticError(Exception):
+class SimulationError(Exception):
     def __init__(self, message: str) -> None:
         self.message = message
 
     def __str__(self) -> str:
-        return 'Semantic Error: ' + self.message
+        return 'Simulation Error: ' + self.message
+
+
+VERSION = '0.3' # Part of the assembly cache key, bump it when the encoding changes
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+INSTS_FILE = os.path.join(DATA_DIR, 'insts.csv')
+PSEUDO_INSTS_FILE = os.path.join(DATA_DIR, 'pseudo_insts.txt')
 
 
 def getInsts():
+    import csv
+
     instructionsDict = {}
 
-    with open('../data/insts.csv', 'r') as file:
+    with open(INSTS_FILE, 'r') as file:
         reader = csv.reader(file)
         
         for row in reader:
@@ -62,15 +325,30 @@ def getInsts():
 def getPseudoInsts():
     pseudoInstructionsList = []
 
-    with open('../data/pseudo_insts.txt', 'r') as file:
+    with open(PSEUDO_INSTS_FILE, 'r') as file:
         pseudoInstructionsList = file.read().splitlines()
 
     return pseudoInstructionsList
 
+def getTablesChecksum() -> int | None: # CRC32 of the data files, None if they can't be read
+    checksum = 0
+
+    try:
+        for fileName in (INSTS_FILE, PSEUDO_INSTS_FILE):
+            with open(fileName, 'rb') as file:
+                checksum = zlib.crc32(file.read(), checksum)
+
+    except OSError:
+        return None
+
+    return checksum
+
 
-# Constants
 INSTRUCTIONS = getInsts()
 PSEUDO_INSTRUCTIONS = getPseudoInsts()
+
+
+# Constants
 IGNORED_CHARS = ' \n\t'
 NUMBERS = '0123456789'
 LETTERS = 'abcdefghijklmnopqrstuvwxyz'
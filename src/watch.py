@@ -0,0 +1,133 @@
+import argparse
+import os
+import time
+
+from compiler import compile, openSource, getIncludes, IncludeCache
+from loader import getOutputPaths, writeBinary
+
+
+def getMtime(fileName: str) -> int | None:
+    try:
+        return os.stat(fileName).st_mtime_ns
+
+    except OSError:
+        return None
+
+
+class Watcher: # Reassembles the watched files when they, or any file they include, change
+    def __init__(self, fileNames: list[str], outputDir: str | None = None, interval: float = 0.5, diskCache = None,
+                 flatAst: bool = False, fused: bool = False, mapped: bool = False) -> None:
+        self.roots = [os.path.realpath(fileName) for fileName in fileNames]
+        self.outputDir = outputDir
+        self.outputPaths = getOutputPaths(fileNames, outputDir, '.bin') # ValueError if two roots share an output
+        self.interval = interval
+        self.flatAst = flatAst
+        self.fused = fused
+        self.mapped = mapped
+        self.includeCache = IncludeCache(diskCache, flatAst, mapped) # Kept between rebuilds, unchanged includes are not reassembled
+        self.includes: dict[str, set[str]] = {} # Include graph: file -> files it includes directly
+        self.mtimes: dict[str, int | None] = {}
+
+        self.updateGraph(self.roots)
+
+    def updateGraph(self, fileNames) -> None: # Rescan the includes of fileNames and of any file newly reachable
+        pending = list(fileNames)
+
+        while pending:
+            fileName = pending.pop()
+            self.mtimes[fileName] = getMtime(fileName)
+
+            if (includes := getIncludes(fileName)) is None: # Keep the last known edges while the file doesn't parse
+                includes = self.includes.get(fileName, set())
+
+            self.includes[fileName] = includes
+
+            for include in includes:
+                if include not in self.includes:
+                    self.includes[include] = set()
+                    pending.append(include)
+
+    def getAffected(self, changed: set[str]) -> set[str]: # Changed files and the files that transitively include them
+        includers: dict[str, set[str]] = {}
+
+        for fileName, includes in self.includes.items():
+            for include in includes:
+                includers.setdefault(include, set()).add(fileName)
+
+        affected = set(changed)
+        pending = list(changed)
+
+        while pending:
+            for includer in includers.get(pending.pop(), ()):
+                if includer not in affected:
+                    affected.add(includer)
+                    pending.append(includer)
+
+        return affected
+
+    def build(self, roots: list[str]) -> None:
+        start = time.perf_counter()
+        built = 0
+
+        for fileName in roots:
+            try:
+                with openSource(fileName, self.mapped) as input:
+                    code = compile(input, True, fileName, self.includeCache, flatAst=self.flatAst, fused=self.fused)
+
+            except Exception as e:
+                print(fileName + ': ' + str(e))
+                continue
+
+            writeBinary(code, self.outputPaths[fileName])
+
+            built += 1
+
+        print(f'Rebuilt {built}/{len(roots)} file(s) in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    def poll(self) -> set[str]: # Files of the include graph modified since the last poll
+        return {fileName for fileName, mtime in self.mtimes.items() if getMtime(fileName) != mtime}
+
+    def run(self) -> None:
+        if self.outputDir is not None:
+            os.makedirs(self.outputDir, exist_ok=True)
+
+        self.build(self.roots)
+
+        while True:
+            time.sleep(self.interval)
+            self.rebuild()
+
+    def rebuild(self) -> set[str]: # Reassemble the roots affected by the files changed since the last poll, returned
+        if changed := self.poll():
+            self.updateGraph(changed)
+            affected = self.getAffected(changed)
+
+            # An unchanged file that includes a changed one would still hit its cache entry
+            self.includeCache.invalidate(affected)
+            self.build([root for root in self.roots if root in affected])
+
+        return changed
+
+
+def main() -> None:
+    argParser = argparse.ArgumentParser(description='Reassemble MOOn-IV sources whenever they or their includes change.')
+    argParser.add_argument('files', nargs='+', help='assembly files to watch')
+    argParser.add_argument('-o', '--output-dir', help='directory for the .bin images (default: next to each source)')
+    argParser.add_argument('-i', '--interval', type=float, default=0.5, help='polling interval in seconds')
+    argParser.add_argument('--flat-ast', action='store_true', help='keep the AST in flat arrays, for very large sources')
+    argParser.add_argument('--fused', action='store_true', help='assemble plain sources in a single pass')
+    argParser.add_argument('--mmap', action='store_true', help='scan memory-mapped sources as bytes, without reading them in')
+    args = argParser.parse_args()
+
+    try:
+        watcher = Watcher(args.files, args.output_dir, args.interval, flatAst=args.flat_ast, fused=args.fused, mapped=args.mmap)
+    except ValueError as e:
+        argParser.error(str(e))
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__': main()
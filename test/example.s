@@ -11,4 +11,4 @@
     sub &2, $4, $5
     addi &2, 20
     sll &2, $2, 4
-    jump _top
\ No newline at end of file
+    jump _start
\ No newline at end of file
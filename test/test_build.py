@@ -0,0 +1,51 @@
+import os
+
+from build import BuildDriver
+from main import assembleFiles
+from test_main import run
+
+
+class RecordingDriver(BuildDriver): # Records what each file was handed when it was submitted
+    def __init__(self, *args) -> None:
+        self.submitted: dict[str, set[str]] = {}
+        super().__init__(*args)
+
+    def getDependencies(self, fileName: str) -> dict:
+        dependencies = super().getDependencies(fileName)
+        self.submitted[fileName] = set(dependencies)
+
+        return dependencies
+
+def writeTree(tmp_path) -> list[str]: # Two roots sharing an include chain: a -> shared -> leaf, b -> shared
+    (tmp_path / 'leaf.s').write_text('.data\n_leaf: .byte 1, 2\n')
+    (tmp_path / 'shared.s').write_text('.include "leaf.s"\n.inst\njump _leaf\n')
+    (tmp_path / 'a.s').write_text('.data\n.word 3\n.include "shared.s"\n')
+    (tmp_path / 'b.s').write_text('.include "shared.s"\n.data\n.word 4\n')
+
+    return [str(tmp_path / 'a.s'), str(tmp_path / 'b.s')]
+
+def test_includes_assembled_first(tmp_path):
+    fileNames = writeTree(tmp_path)
+    driver = RecordingDriver(fileNames, 2)
+    results = driver.build()
+
+    # Every file got all of its includes already assembled, each file was assembled once
+    assert {fileName: driver.includes[fileName] for fileName in driver.submitted} == driver.submitted
+    assert set(driver.submitted) == set(driver.includes)
+
+    serial = assembleFiles(fileNames, None)
+    assert {fileName: code.code for fileName, code in results.items()} == {
+        fileName: code.code for fileName, code in serial.items()
+    }
+
+def test_errors_read_as_in_a_serial_build(tmp_path):
+    (tmp_path / 'inner.s').write_text('.data\n.byte 300\n')
+    (tmp_path / 'bad.s').write_text('.include "inner.s"\n')
+    (tmp_path / 'undef.s').write_text('.inst\njump _nowhere\n')
+    (tmp_path / 'a.s').write_text('.data\n.byte 1\n')
+
+    serial = run(tmp_path, 'bad.s', 'undef.s', 'a.s')
+    parallel = run(tmp_path, 'bad.s', 'undef.s', 'a.s', '-j', '2')
+
+    assert parallel.stderr == serial.stderr
+    assert 'bad.s, line 1, column 1' in serial.stderr and os.sep + 'bad.s' not in serial.stderr
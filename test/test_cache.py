@@ -0,0 +1,67 @@
+import os
+
+from asm_cache import AssemblyCache
+from compiler import compile, IncludeCache
+
+
+SOURCE = '.data\n_x: .byte 1, 2\n.space 200\n.inst\njump _x\n'
+
+
+def test_hits_and_misses(tmp_path):
+    cache = AssemblyCache(str(tmp_path))
+    key = cache.getKey(SOURCE, None)
+    code = compile(SOURCE, False)
+
+    assert cache.get(key) is None
+    cache.put(key, code)
+    cached = cache.get(key)
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert (cached.code, cached.offsets, cached.fixups) == (code.code, code.offsets, code.fixups)
+
+def test_warm_compile(tmp_path):
+    expected = compile(SOURCE).code
+
+    for hits in (0, 1):
+        cache = AssemblyCache(str(tmp_path)) # A new run on the same directory
+        assert compile(SOURCE, includeCache=IncludeCache(cache)).code == expected
+        assert cache.hits == hits
+
+def test_changed_include_misses(tmp_path):
+    include = tmp_path / 'inc.s'
+    include.write_text('.data\n.byte 1\n')
+    main = str(tmp_path / 'main.s')
+    source = '.include "inc.s"\n'
+
+    compile(source, True, main, IncludeCache(AssemblyCache(str(tmp_path / 'cache'))))
+    include.write_text('.data\n.byte 2\n')
+    cache = AssemblyCache(str(tmp_path / 'cache'))
+
+    assert compile(source, True, main, IncludeCache(cache)).code == b'\x02'
+    assert (cache.hits, cache.misses) == (0, 2) # The stale entry, and the include itself
+
+def test_least_recently_used_evicted(tmp_path):
+    cache = AssemblyCache(str(tmp_path))
+    keys = [cache.getKey(f'.data\n.byte {index}\n', None) for index in range(3)]
+
+    for index, key in enumerate(keys):
+        cache.put(key, compile(f'.data\n.byte {index}\n', False))
+        os.utime(cache.getPath(key), (index, index)) # Oldest first, without waiting on the clock
+
+    os.utime(cache.getPath(keys[0]), (10, 10)) # Used again, now the most recent
+    cache.maxSize = cache.size - 1
+    cache.evict()
+
+    assert [os.path.exists(cache.getPath(key)) for key in keys] == [True, False, True]
+    assert cache.evictions == 1
+    assert cache.size == sum(entry.stat().st_size for entry in cache.getEntries())
+
+def test_put_evicts_over_max_size(tmp_path):
+    cache = AssemblyCache(str(tmp_path), maxSize=1000)
+
+    for index in range(20):
+        cache.put(cache.getKey(f'.data\n.byte {index}\n', None), compile(f'.data\n.byte {index}\n', False))
+
+    assert 0 < cache.size <= 1000
+    assert cache.evictions > 0
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
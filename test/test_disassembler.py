@@ -0,0 +1,35 @@
+import pytest
+
+import synthetic
+from compiler import compile
+from disassembler import Disassembler
+
+
+@pytest.fixture(scope='module')
+def disassembler() -> Disassembler: # Building the table of every word takes a while, it is shared
+    return Disassembler()
+
+def test_every_word(disassembler: Disassembler):
+    code = b''.join(word.to_bytes(2, 'big') for word in range(0x10000))
+
+    assert compile(disassembler.disassemble(code)).code == code
+
+@pytest.mark.parametrize('seed', range(4))
+def test_synthetic_programs(disassembler: Disassembler, seed: int):
+    code = bytes(compile(synthetic.generate(1000, 200, seed=seed, fieldSize=100)).code)
+
+    assert compile(disassembler.disassemble(code)).code == code
+
+@pytest.mark.parametrize('code', (b'', b'\x07', b'\x12\x34\x56'))
+def test_short_images(disassembler: Disassembler, code: bytes):
+    assert compile(disassembler.disassemble(code)).code == code
+
+def test_table_cache(tmp_path):
+    lines = Disassembler(str(tmp_path)).lines
+
+    assert Disassembler(str(tmp_path)).lines == lines == Disassembler().lines
+
+def test_table_cache_leaves_no_temporary_files(tmp_path):
+    Disassembler(str(tmp_path))
+
+    assert [path.suffix for path in tmp_path.iterdir()] == ['.txt']
@@ -0,0 +1,25 @@
+import pytest
+
+import synthetic
+from asm_scanner import Scanner
+from asm_table_parser import TableParser
+from asm_encoder import encodeInst, emitInst
+from asm_visitor import INST_NODE_TYPES
+from bench_encoder import stringEncode
+
+
+def getInstNodes(source: str) -> list:
+    ast = TableParser(Scanner(source).getTokenStream()).getAst()
+
+    return [node for field in ast.children for node in field.children if node.type in INST_NODE_TYPES]
+
+@pytest.mark.parametrize('seed', range(4))
+def test_encoder_matches_bit_strings(seed: int):
+    # The integer encoder against the bit string encoding the Visitor used before it
+    for node in getInstNodes(synthetic.generate(2000, seed=seed)):
+        expected = bytes(int(byte.byte, 2) for byte in stringEncode(node))
+        code = bytearray()
+        emitInst(code, node)
+
+        assert encodeInst(node).to_bytes(2, 'big') == expected, repr(node)
+        assert code == expected, repr(node)
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+from asm_cache import AssemblyCache
+from build import BuildDriver
+from compiler import compile, mapSource, IncludeCache, CodeStream
+from loader import writeBinaryStream
+from utils import SourceError
+
+
+# Case -> (files, error of main.s). {main} and the like are the paths of the files
+CASES = {
+    'lexical': (
+        {'main.s': '.data\n.byte 1 @\n'},
+        'Lexical Error: Invalid character: @ ({main}, line 2, column 9)',
+    ),
+    'syntactic': (
+        {'main.s': '.data\n.byte\n.inst\n'},
+        'Syntactic Error: Expected number. Got "instDir" ({main}, line 3, column 1)',
+    ),
+    'mnemonic': (
+        {'main.s': '.inst\n  addd &0, $1, $2\n'},
+        'Syntactic Error: Invalid mnemonic: addd ({main}, line 2, column 3)',
+    ),
+    'semantic': (
+        {'main.s': '.data\n.byte 1, 300\n'},
+        'Semantic Error: Byte out of bounds. ({main}, line 2, column 10)',
+    ),
+    'register': (
+        {'main.s': '.inst\nadd &5, $1, $2\n'},
+        'Semantic Error: AC register out of bounds. ({main}, line 2, column 5)',
+    ),
+    'label declared twice': (
+        {'main.s': '.data\n_x: .byte 1\n_x: .byte 2\n'},
+        'Semantic Error: Label declared more than once: _x ({main}, line 3, column 1)',
+    ),
+    'include': (
+        {'main.s': '.inst\nadd &0, $1, $2\n.include "inner.s"\n', 'inner.s': '.data\n.byte 1\n  .byte 256\n'},
+        'Semantic Error: Byte out of bounds. ({inner}, line 3, column 9; included from {main}, line 3, column 1)',
+    ),
+    'missing include': (
+        {'main.s': '.data\n.byte 1\n.include "missing.s"\n'},
+        'Semantic Error: Cannot read included file (No such file or directory): {missing} ({main}, line 3, column 1)',
+    ),
+    'missing nested include': (
+        {'main.s': '.data\n.byte 1\n.include "inner.s"\n', 'inner.s': '.include "missing.s"\n.data\n.byte 2\n'},
+        'Semantic Error: Cannot read included file (No such file or directory): {missing} ({inner}, line 1, column 1; '
+        'included from {main}, line 3, column 1)',
+    ),
+    'cycle': (
+        {'main.s': '.include "a.s"\n', 'a.s': '.data\n.byte 1\n.include "main.s"\n'},
+        'Semantic Error: Cyclic include: {main} -> {a} -> {main} ({a}, line 3, column 1; included from {main}, line 1, column 1)',
+    ),
+    'undefined label': (
+        {'main.s': '.inst\n  jump _nowhere\n'},
+        'Semantic Error: Undefined label: _nowhere ({main}, line 2, column 8)',
+    ),
+    'unaligned label': (
+        {'main.s': '.data\n.byte 1\n_odd: .byte 1\n.inst\njump _odd\n'},
+        'Semantic Error: Label is not word aligned: _odd ({main}, line 5, column 6)',
+    ),
+    'undefined label in include': (
+        {'main.s': '.data\n.byte 1\n.include "inner.s"\n', 'inner.s': '.inst\n  jump _nowhere\n'},
+        'Semantic Error: Undefined label: _nowhere ({main}, line 3, column 1)',
+    ),
+}
+
+
+def compileText(fileName: str, tmp_path, **options) -> None:
+    with open(fileName, 'r') as f:
+        compile(f.read(), True, fileName, **options)
+
+def compileMapped(fileName: str, tmp_path) -> None:
+    with mapSource(fileName) as source:
+        compile(source, True, fileName, IncludeCache(mapped=True))
+
+def compileCached(fileName: str, tmp_path) -> None: # The second time from the cache, when it got that far
+    for _ in range(2):
+        compileText(fileName, tmp_path, includeCache=IncludeCache(AssemblyCache(str(tmp_path / 'cache'))))
+
+def stream(fileName: str, tmp_path) -> None:
+    with open(fileName, 'r') as f:
+        writeBinaryStream(CodeStream(f.read(), fileName), str(tmp_path / 'main.bin'))
+
+MODES = {
+    'text': compileText,
+    'flat': lambda fileName, tmp_path: compileText(fileName, tmp_path, flatAst=True),
+    'fused': lambda fileName, tmp_path: compileText(fileName, tmp_path, fused=True),
+    'mmap': compileMapped,
+    'cached': compileCached,
+    'stream': stream,
+}
+
+
+def writeCase(tmp_path, case: str) -> tuple[str, str]: # Path of main.s and the error expected for it
+    directory = os.path.realpath(tmp_path)
+    files, error = CASES[case]
+    paths = {'missing': os.path.join(directory, 'missing.s')}
+
+    for name, source in files.items():
+        paths[name[:-2]] = os.path.join(directory, name)
+
+        with open(paths[name[:-2]], 'w') as f:
+            f.write(source)
+
+    return paths['main'], error.format(**paths)
+
+@pytest.mark.parametrize('mode', MODES)
+@pytest.mark.parametrize('case', CASES)
+def test_error_location(tmp_path, case: str, mode: str):
+    fileName, error = writeCase(tmp_path, case)
+
+    with pytest.raises(SourceError) as info:
+        MODES[mode](fileName, tmp_path)
+
+    assert str(info.value) == error
+
+@pytest.mark.parametrize('case', (
+    'include', 'missing include', 'missing nested include', 'cycle', 'undefined label', 'undefined label in include'
+))
+def test_error_location_parallel(tmp_path, case: str):
+    fileName, error = writeCase(tmp_path, case)
+
+    assert BuildDriver([fileName], 2).build()[fileName] == error
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+import build
+import synthetic
+import watch
+from asm_fused import assembleFused
+from compiler import compile
+from test_main import run
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_fused_matches_pipeline(seed: int):
+    source = synthetic.generate(1000, 200, seed=seed, fieldSize=100)
+
+    assert assembleFused(source) is not None # Handled in a single pass, not left to the pipeline
+    assert compile(source, fused=True).code == compile(source).code
+    assert compile(source.encode(), fused=True).code == compile(source).code
+
+def recordCompile(monkeypatch, module) -> list[dict]: # Options of every compile call made through module
+    calls = []
+
+    def recording(*args, **options):
+        calls.append(options)
+        return compile(*args, **options)
+
+    monkeypatch.setattr(module, 'compile', recording)
+
+    return calls
+
+def test_workers_assemble_fused(tmp_path, monkeypatch):
+    (tmp_path / 'a.s').write_text('.inst\nnope\n')
+    calls = recordCompile(monkeypatch, build)
+    monkeypatch.setattr(build, 'includeCache', None) # Worker state, set in this process by initWorker
+    monkeypatch.setattr(build, 'fused', False)
+    build.initWorker(None, False, True)
+
+    assert build.assembleUnit(str(tmp_path / 'a.s'), {})[0] == 'ok'
+    assert calls[0]['fused']
+
+def test_watcher_assembles_fused(tmp_path, monkeypatch):
+    (tmp_path / 'a.s').write_text('.inst\nnope\n')
+    calls = recordCompile(monkeypatch, watch)
+    watcher = watch.Watcher([str(tmp_path / 'a.s')], fused=True)
+    watcher.build(watcher.roots)
+
+    assert calls[0]['fused']
+    assert os.path.exists(tmp_path / 'a.bin')
+
+def test_stream_rejects_fused(tmp_path):
+    (tmp_path / 'a.s').write_text('.inst\nnope\n')
+    result = run(tmp_path, 'a.s', '--stream', '--fused')
+
+    assert result.returncode == 2
+    assert "--fused can't be combined with --stream" in result.stderr
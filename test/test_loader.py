@@ -0,0 +1,105 @@
+import pytest
+
+from compiler import compile
+from loader import writeBinary, writeIntelHex, writeLogisim, writeHexText, writeBinText, IMAGE_WORDS
+
+
+def readIntelHex(path) -> bytes: # Memory image of an Intel HEX file. Every address up to the last one needs a record
+    memory = {}
+    upper = 0
+    lines = path.read_text().splitlines()
+
+    assert lines[-1] == ':00000001FF'
+
+    for line in lines[:-1]:
+        record = bytes.fromhex(line[1:])
+        size, address, recordType = record[0], int.from_bytes(record[1:3], 'big'), record[3]
+
+        assert sum(record) & 0xFF == 0 and len(record) == size + 5
+
+        if recordType == 4:
+            upper = int.from_bytes(record[4:6], 'big') << 16
+            continue
+
+        assert recordType == 0 and address + size <= 0x10000 # Data records never cross a 64 KiB boundary
+
+        for index in range(size):
+            memory[upper + address + index] = record[4 + index]
+
+    return bytes(memory[address] for address in range(max(memory) + 1)) if memory else b''
+
+def readLogisim(path) -> list[int]: # Words of a Logisim image, run-length entries expanded
+    lines = path.read_text().splitlines()
+    words = []
+
+    assert lines[0] == 'v2.0 raw'
+
+    for entry in ' '.join(lines[1:]).split():
+        count, _, word = entry.rpartition('*')
+        words += [int(word, 16)] * int(count or 1)
+
+    return words
+
+IMAGES = [b'', b'\x12', b'\x12\x34\xab', bytes(range(256)) * 3, bytes(range(1, 256)) * 300]
+
+
+@pytest.mark.parametrize('image', IMAGES)
+def test_binary(tmp_path, image: bytes):
+    writeBinary(image, tmp_path / 'out.bin')
+
+    assert (tmp_path / 'out.bin').read_bytes() == image
+
+@pytest.mark.parametrize('image', IMAGES)
+def test_intel_hex(tmp_path, image: bytes):
+    writeIntelHex(image, tmp_path / 'out.ihex')
+
+    assert readIntelHex(tmp_path / 'out.ihex') == image
+
+def test_intel_hex_extended_addresses(tmp_path):
+    image = bytes(range(1, 256)) * 600 # Past 128 KiB
+    writeIntelHex(image, tmp_path / 'out.ihex', recordSize=32)
+    lines = (tmp_path / 'out.ihex').read_text().splitlines()
+
+    assert [line for line in lines if line[7:9] == '04'] == [':020000040001F9', ':020000040002F8']
+    assert lines[0] == ':20000000' + image[:32].hex().upper() + format(-sum(bytes((32, 0, 0, 0)) + image[:32]) & 0xFF, '02X')
+
+@pytest.mark.parametrize('source', (
+    '.data\n.byte 7\n.space 70000\n.byte 1, 2\n', # Zero extent across the first 64 KiB boundary
+    '.data\n.space 100000\n', # Image that is a single extent
+    '.data\n.byte 7\n.space 20000\n.byte 1\n.space 50000\n', # Extent at the end
+))
+def test_intel_hex_zero_extents(tmp_path, source: str):
+    # Extents are written as data records: loaders would fill gaps in the addresses with 0xFF, not zeros
+    code = compile(source)
+    writeIntelHex(code, tmp_path / 'out.ihex')
+
+    assert any(piece.__class__ is int for piece in code.getPieces())
+    assert readIntelHex(tmp_path / 'out.ihex') == code.code
+
+@pytest.mark.parametrize('image', IMAGES)
+def test_logisim(tmp_path, image: bytes):
+    writeLogisim(image, tmp_path / 'out.img')
+    words = readLogisim(tmp_path / 'out.img')
+    padded = image + b'\0' * (len(image) % 2)
+
+    assert words[:len(padded) // 2] == [int.from_bytes(padded[index:index + 2], 'big') for index in range(0, len(padded), 2)]
+    assert not any(words[len(padded) // 2:])
+    assert len(words) == max(IMAGE_WORDS, len(padded) // 2)
+
+@pytest.mark.parametrize('image', IMAGES)
+@pytest.mark.parametrize('bits', (False, True))
+def test_word_lines(tmp_path, image: bytes, bits: bool):
+    (writeBinText if bits else writeHexText)(image, tmp_path / 'out.txt')
+    lines = (tmp_path / 'out.txt').read_text().splitlines()
+    padded = image + b'\0' * (len(image) % 2)
+
+    assert [int(line, 2 if bits else 16) for line in lines] == (
+        [int.from_bytes(padded[index:index + 2], 'big') for index in range(0, len(padded), 2)]
+        + [0] * max(IMAGE_WORDS - len(padded) // 2, 0)
+    )
+    assert {len(line) for line in lines} == {16 if bits else 4}
+
+def test_word_lines_unpadded(tmp_path):
+    writeHexText(b'\x12\x34', tmp_path / 'out.hex', pad=False)
+
+    assert (tmp_path / 'out.hex').read_text() == '1234\n'
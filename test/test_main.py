@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+MAIN = os.path.join(ROOT, 'src', 'main.py')
+
+
+def run(tmp_path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, MAIN, *args], cwd=tmp_path, capture_output=True, text=True)
+
+def writeSources(tmp_path) -> None:
+    (tmp_path / 'a.s').write_text('.data\n.byte 1\n')
+    (tmp_path / 'b.s').write_text('.data\n.byte 2\n')
+    (tmp_path / 'bad.s').write_text('.data\n.byte 1 @\n')
+
+def test_batch(tmp_path):
+    writeSources(tmp_path)
+    result = run(tmp_path, 'a.s', 'b.s')
+
+    assert result.returncode == 0
+    assert result.stdout.splitlines() == ['a.s -> a.bin', 'b.s -> b.bin', '2 assembled, 0 failed']
+    assert (tmp_path / 'b.bin').read_bytes() == b'\x02'
+
+def test_manifest_and_output_dir(tmp_path):
+    writeSources(tmp_path)
+    (tmp_path / 'list.txt').write_text('# Sources\na.s\n\nb.s\n')
+    result = run(tmp_path, '-m', 'list.txt', '-o', 'out', '-f', 'hex', '-q')
+
+    assert (result.returncode, result.stdout) == (0, '')
+    assert sorted(os.listdir(tmp_path / 'out')) == ['a.hex', 'b.hex']
+
+def test_failures_counted(tmp_path):
+    writeSources(tmp_path)
+    result = run(tmp_path, 'bad.s', 'a.s', 'missing.s')
+
+    assert result.returncode == 1
+    assert result.stdout.splitlines() == ['a.s -> a.bin', '1 assembled, 2 failed']
+    assert result.stderr.splitlines()[0] == 'bad.s: Lexical Error: Invalid character: @ (bad.s, line 2, column 9)'
+    assert result.stderr.splitlines()[1].startswith('missing.s: ')
+
+def test_output_collision_rejected(tmp_path):
+    for directory in ('x', 'y'):
+        os.makedirs(tmp_path / directory)
+        (tmp_path / directory / 'a.s').write_text('.data\n.byte 1\n')
+
+    result = run(tmp_path, 'x/a.s', 'y/a.s', '-o', 'out')
+
+    assert result.returncode == 2
+    assert 'would both be written to' in result.stderr
+    assert not os.path.exists(tmp_path / 'out')
+
+def test_same_file_twice_is_not_a_collision(tmp_path):
+    writeSources(tmp_path)
+
+    assert run(tmp_path, 'a.s', './a.s', '-q').returncode == 0
+
+def test_no_input_files(tmp_path):
+    result = run(tmp_path)
+
+    assert result.returncode == 2
+    assert 'no input files' in result.stderr
+
+def test_stream_rejects_other_formats(tmp_path):
+    writeSources(tmp_path)
+
+    assert run(tmp_path, 'a.s', '--stream', '-f', 'hex').returncode == 2
+
+def test_debug_error_keeps_going(tmp_path):
+    writeSources(tmp_path)
+    result = run(tmp_path, '--tokens', 'bad.s', 'a.s')
+
+    assert result.returncode == 1
+    assert result.stdout.splitlines()[-2:] == ['a.s -> a.bin', '1 assembled, 1 failed']
+    assert result.stderr == 'bad.s: Lexical Error: Invalid character: @ (bad.s, line 2, column 9)\n'
+
+def test_write_error_keeps_going(tmp_path):
+    writeSources(tmp_path)
+    os.makedirs(tmp_path / 'a.bin')
+    result = run(tmp_path, 'a.s', 'b.s')
+
+    assert result.returncode == 1
+    assert result.stdout.splitlines() == ['b.s -> b.bin', '1 assembled, 1 failed']
+    assert result.stderr.startswith('a.s: ')
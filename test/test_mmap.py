@@ -0,0 +1,61 @@
+import hashlib
+import mmap
+import os
+
+import build
+import main
+import watch
+from compiler import compile
+
+
+SOURCE = '.data\n_start: .byte 1, 2\n.inst\njump _start\n'
+
+def recordInputs(monkeypatch, module) -> list: # Type of the input of every compile call made through module
+    inputs = []
+
+    def recording(input, *args, **options):
+        inputs.append(type(input))
+        return compile(input, *args, **options)
+
+    monkeypatch.setattr(module, 'compile', recording)
+
+    return inputs
+
+def test_workers_scan_mapped(tmp_path, monkeypatch):
+    (tmp_path / 'a.s').write_text(SOURCE)
+    inputs = recordInputs(monkeypatch, build)
+    monkeypatch.setattr(build, 'includeCache', None) # Worker state, set in this process by initWorker
+    build.initWorker(None, False, False, True)
+    result = build.assembleUnit(str(tmp_path / 'a.s'), {})
+
+    assert inputs == [mmap.mmap]
+    assert result[:2] == ('ok', hashlib.sha256(SOURCE.encode()).hexdigest()) # Same digest as from the read bytes
+
+def test_parallel_build_mapped(tmp_path):
+    (tmp_path / 'inc.s').write_text(SOURCE)
+    (tmp_path / 'a.s').write_text('.include "inc.s"\n.data\n.byte 3\n')
+    (tmp_path / 'empty.s').write_text('')
+    fileNames = [str(tmp_path / 'a.s'), str(tmp_path / 'empty.s')]
+    results = build.BuildDriver(fileNames, 2, mapped=True).build()
+
+    assert {fileName: code.code for fileName, code in results.items()} == {
+        fileName: code.code for fileName, code in main.assembleFiles(fileNames, None).items()
+    }
+
+def test_profile_mapped(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'a.s').write_text(SOURCE)
+    inputs = recordInputs(monkeypatch, main)
+    results = main.profileFiles([str(tmp_path / 'a.s')], None, 'stats', mapped=True)
+
+    assert inputs == [mmap.mmap]
+    assert results[os.path.realpath(tmp_path / 'a.s')].code == compile(SOURCE).code
+    assert 'scanner' in capsys.readouterr().err
+
+def test_watcher_mapped(tmp_path, monkeypatch):
+    (tmp_path / 'a.s').write_text(SOURCE)
+    inputs = recordInputs(monkeypatch, watch)
+    watcher = watch.Watcher([str(tmp_path / 'a.s')], mapped=True)
+    watcher.build(watcher.roots)
+
+    assert inputs == [mmap.mmap]
+    assert (tmp_path / 'a.bin').read_bytes() == compile(SOURCE).code
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import synthetic
+from asm_scanner import Scanner
+from utils import SourceError
+
+
+# Pieces of sources, valid or not, glued together at random
+PIECES = [
+    '.inst', '.data', '.word', '.byte', '.include', 'add', 'jump', '_lab', '&0', '$12', '12', ',', ':', ' ', '\n', '\t',
+    '#c x\n', '"hi"', '"a b"', '@', 'é', '(', ')', '&01', 'ab1', '\0',
+]
+
+
+def scan(source, useRegex: bool = True, lazy: bool = False): # Tokens, or the error and its offset
+    try:
+        scanner = Scanner(source, useRegex, lazy)
+        return list(scanner.iterTokens()) if lazy else scanner.getTokenStream()
+
+    except SourceError as e:
+        return (type(e).__name__, e.message, e.offset)
+
+def test_random_sources():
+    rng = random.Random(0)
+
+    for _ in range(5000):
+        source = ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 12)))
+        expected = scan(source, useRegex=False)
+
+        assert scan(source) == expected, repr(source)
+        assert scan(source, lazy=True) == expected, repr(source)
+
+        if source.isascii(): # Offsets of the bytes scanner count bytes
+            assert scan(source.encode()) == expected, repr(source)
+
+@pytest.mark.parametrize('seed', range(4))
+def test_synthetic_programs(seed: int):
+    source = synthetic.generate(500, 100, seed=seed, fieldSize=50 if seed % 2 else 0)
+    expected = scan(source, useRegex=False)
+
+    assert scan(source) == expected
+    assert scan(source.encode()) == expected
+    assert scan(bytearray(source.encode()), lazy=True) == expected
+
+def test_bytes_offsets_count_bytes():
+    assert scan('.data\n.byte 1 # é\n.byte 2 é'.encode()) == ('LexicalError', 'Invalid character: é', 27)
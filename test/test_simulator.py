@@ -0,0 +1,81 @@
+import pytest
+
+import synthetic
+from compiler import compile
+from simulator import Simulator, BlockSimulator, SimulationError
+from bench_simulator import LOOP_PROGRAM
+
+
+ENGINES = (Simulator, BlockSimulator)
+
+
+def getState(simulator: Simulator) -> tuple:
+    return (simulator.pc, simulator.steps, simulator.halted, simulator.ac, simulator.rf, simulator.mem)
+
+def runEngines(code, maxSteps: int) -> list: # State reached, or error raised, by each engine and by step
+    states = []
+
+    for engine in ENGINES:
+        simulator = engine(code)
+
+        try:
+            simulator.run(maxSteps)
+        except SimulationError as e:
+            states.append(str(e))
+        else:
+            states.append(getState(simulator))
+
+    reference = Simulator(code) # Decoding every step
+
+    try:
+        while not reference.halted and reference.steps < maxSteps:
+            reference.step()
+    except SimulationError as e:
+        states.append(str(e))
+    else:
+        states.append(getState(reference))
+
+    return states
+
+@pytest.mark.parametrize('maxSteps', (1, 7, 1000, 50_000))
+def test_loop_program(maxSteps: int):
+    states = runEngines(compile(LOOP_PROGRAM).code, maxSteps)
+
+    assert states.count(states[0]) == len(states)
+
+@pytest.mark.parametrize('seed', range(8))
+@pytest.mark.parametrize('types', (None, ('n', 'r', 'i', 's', 'j', 'e1', 'e3', 'e4')))
+def test_synthetic_programs(seed: int, types):
+    # Random instructions: branches, stores into the code and errors all have to agree. Without tdiv (type e2) the
+    # programs run longer before a division by zero
+    code = compile(synthetic.generate(300, seed=seed, labelRate=0, types=types)).code
+    states = runEngines(code, 5000)
+
+    assert states.count(states[0]) == len(states)
+
+def test_halts_on_jump_to_itself():
+    simulator = Simulator(compile('.inst\nlli &0, 5\n_end: jump _end\n').code)
+
+    assert simulator.run() == 2
+    assert simulator.halted and simulator.ac[0] == 5
+
+SELF_MODIFYING_PROGRAM = '''
+.inst
+    lli &0, 8
+    mfac &0, $1
+    lwr &3, $1, $0
+    lli &0, 6
+    mfac &0, $1
+    swr &3, $1, $0
+    addi &2, 1
+    _end: jump _end
+    addi &2, 100
+'''
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_store_into_running_block(engine):
+    # The store replaces the instruction right after it, inside the block already compiled
+    simulator = engine(compile(SELF_MODIFYING_PROGRAM).code)
+    simulator.run()
+
+    assert simulator.halted and simulator.ac[2] == 100
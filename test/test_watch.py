@@ -0,0 +1,57 @@
+import os
+
+from watch import Watcher
+
+
+def write(path, text: str, mtime: int) -> None: # With an explicit mtime, edits are seen whatever the clock resolution
+    path.write_text(text)
+    os.utime(path, ns=(mtime, mtime))
+
+def makeTree(tmp_path) -> tuple[Watcher, dict]:
+    paths = {name: tmp_path / (name + '.s') for name in ('main', 'inc', 'other')}
+    write(paths['main'], '.data\n.byte 1\n.include "inc.s"\n', 1)
+    write(paths['inc'], '.data\n.byte 2\n', 1)
+    write(paths['other'], '.data\n.byte 3\n', 1)
+
+    watcher = Watcher([str(paths['main']), str(paths['other'])], str(tmp_path / 'out'))
+    os.makedirs(watcher.outputDir)
+    watcher.build(watcher.roots)
+
+    return watcher, paths
+
+def test_include_change_rebuilds_includers(tmp_path, capsys):
+    watcher, paths = makeTree(tmp_path)
+    write(paths['inc'], '.data\n.byte 9\n', 2)
+
+    assert watcher.rebuild() == {os.path.realpath(paths['inc'])}
+    assert (tmp_path / 'out' / 'main.bin').read_bytes() == b'\x01\x09'
+    assert capsys.readouterr().out.splitlines()[-1].startswith('Rebuilt 1/1 file(s)')
+
+def test_unchanged_files_not_rebuilt(tmp_path, capsys):
+    watcher, paths = makeTree(tmp_path)
+    capsys.readouterr()
+
+    assert watcher.rebuild() == set()
+    assert capsys.readouterr().out == ''
+
+def test_new_include_is_watched(tmp_path):
+    watcher, paths = makeTree(tmp_path)
+    write(tmp_path / 'new.s', '.data\n.byte 5\n', 1)
+    write(paths['other'], '.data\n.byte 3\n.include "new.s"\n', 2)
+    watcher.rebuild()
+    write(tmp_path / 'new.s', '.data\n.byte 6\n', 3)
+    watcher.rebuild()
+
+    assert (tmp_path / 'out' / 'other.bin').read_bytes() == b'\x03\x06'
+
+def test_error_keeps_watching(tmp_path, capsys):
+    watcher, paths = makeTree(tmp_path)
+    write(paths['inc'], '.data\n.byte 300\n', 2)
+    watcher.rebuild()
+
+    assert 'Byte out of bounds' in capsys.readouterr().out
+
+    write(paths['inc'], '.data\n.byte 4\n', 3)
+    watcher.rebuild()
+
+    assert (tmp_path / 'out' / 'main.bin').read_bytes() == b'\x01\x04'